@@ -1,45 +1,487 @@
 import os
 import time
-from stl_processing import load_stl, save_stl, split_model
-from section_analysis import compute_long_axis, find_max_section, plot_heatmap_on_section
+import multiprocessing
+import queue
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from stl_processing import load_stl, classify_parts, extract_part_features
+from section_analysis import compute_long_axis, find_max_section, compute_section_area, plot_heatmap_on_section
+from mesh_geometry import split_masks, mesh_data, face_subset
+from result_cache import ResultCache
+from stl_io import BackgroundStlWriter, write_stl
+from heatmap import heatmap_paths
+from manifest import ManifestWriter
+from instrumentation import Instrumentation
 
-def process_single_stl(file_path, output_stl_folder, output_heatmap_folder):
-    """处理单个 STL 文件"""
+# 子进程中需要固定为单线程的 BLAS / OpenMP 环境变量，另外强制 matplotlib 使用无界面后端
+# （BLAS 在导入 numpy 时读取这些变量，所以进程池用 spawn 启动全新的解释器，fork 出的子进程会沿用父进程已初始化的线程池）
+WORKER_ENVIRONMENT = {
+    "OMP_NUM_THREADS": "1",
+    "OPENBLAS_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+    "VECLIB_MAXIMUM_THREADS": "1",
+    "NUMEXPR_NUM_THREADS": "1",
+    "MPLBACKEND": "Agg",
+}
+
+# 影响几何结果的算法参数，参与结果缓存的键
+DEFAULT_PARAMS = {
+    "area_weighted": False,
+    "search": "grid",
+    "tolerance": 0.05,
+    "weld": False,  # True 时以焊接顶点后的 IndexedMesh 计算（长轴中共享顶点只计一次）
+}
+
+# 流式批处理中阶段之间的队列长度（队列满时上游阻塞）
+STREAM_QUEUE_SIZE = 2
+
+# 处理阶段：(阶段名, 说明, 阶段开始时单个文件的完成百分比)
+PROGRESS_STAGES = (
+    ("load", "加载 STL 文件", 0),
+    ("long_axis", "计算牙齿中心和主轴", 10),
+    ("max_section", "计算最大截面", 20),
+    ("split", "切割模型", 55),
+    ("classify", "区分牙冠与牙根", 58),
+    ("write_stl", "保存 STL 文件", 65),
+    ("heatmap", "生成并保存热力图", 70),
+    ("done", "处理完成", 100),
+)
+
+# 进度事件：percent 为整个任务（批量时为全部文件）的完成百分比
+ProgressEvent = namedtuple("ProgressEvent", ["file_path", "stage", "message", "percent"])
+
+class ProcessingCancelled(Exception):
+    """处理在阶段边界被取消"""
+
+class ProgressReporter:
+    """
+    在每个阶段开始时发出 ProgressEvent，并在阶段之间检查取消标志。
+    - callback 接收 ProgressEvent，可以直接传入 queue.Queue().put，由界面线程读取；
+    - cancel_event（threading.Event）被设置后，下一个阶段开始时抛出 ProcessingCancelled；
+    - 批量处理时 file_index / file_count 把单个文件的进度换算为总进度；
+    - 传入 instrumentation.FileMetrics 时，阶段边界同时是测量边界，count() 记录切片次数等计数。
+    """
+    def __init__(self, callback=None, cancel_event=None, file_path=None, file_index=0, file_count=1, metrics=None):
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.file_path = file_path
+        self.file_index = file_index
+        self.file_count = file_count
+        self.metrics = metrics
+
+    def for_file(self, file_path, file_index, file_count, metrics=None):
+        """批量处理中第 file_index 个文件使用的报告器"""
+        return ProgressReporter(self.callback, self.cancel_event, file_path, file_index, file_count, metrics)
+
+    def count(self, name, value):
+        if self.metrics is not None:
+            self.metrics.count(name, value)
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ProcessingCancelled(self.file_path)
+
+    def stage(self, name):
+        self.check_cancelled()
+        if self.metrics is not None:
+            if name == "done":
+                self.metrics.stop()
+            else:
+                self.metrics.start(name)
+        if self.callback is None:
+            return
+        for stage, message, percent in PROGRESS_STAGES:
+            if stage == name:
+                total = (self.file_index + percent / 100) / self.file_count * 100
+                self.callback(ProgressEvent(self.file_path, stage, message, total))
+                return
+        raise ValueError(f"未知的处理阶段: {name}")
+
+def compute_geometry(model, params, reporter=None):
+    """计算长轴、最大截面和分割掩码，返回可缓存的结果字典（upper_mask 始终对应牙冠，另含牙冠 / 牙根特征向量）"""
+    reporter = reporter or ProgressReporter()
+    reporter.stage("long_axis")
+    center, long_axis = compute_long_axis(model, params["area_weighted"])
+    reporter.stage("max_section")
+    stats = {}
+    max_section_points, max_plane_point = find_max_section(model, center, long_axis, search=params["search"],
+                                                           tolerance=params["tolerance"], stats=stats)
+    reporter.count("slices", stats.get("slices", 0))
+    if max_plane_point is None:
+        return None
+
+    reporter.stage("split")
+    triangles = mesh_data(model)
+    above_mask, below_mask = split_masks(triangles, max_plane_point, long_axis)
+    if hasattr(triangles, "faces"):
+        # 索引网格的两半仍为索引网格，特征计算直接建立边邻接，不必重新焊接
+        above, below = triangles.submesh(above_mask), triangles.submesh(below_mask)
+    else:
+        above, below = face_subset(triangles, above_mask), face_subset(triangles, below_mask)
+
+    reporter.stage("classify")
+    above_features, below_features = extract_part_features(above), extract_part_features(below)
+    upper, _ = classify_parts(above, below, above_features, below_features)
+    if upper is not above:
+        above_mask, below_mask = below_mask, above_mask
+        above_features, below_features = below_features, above_features
+
+    section_area = compute_section_area(max_section_points, long_axis) if max_section_points is not None else 0
+    return {
+        "centroid": center,
+        "long_axis": long_axis,
+        "max_plane_point": max_plane_point,
+        "section_area": section_area,
+        "crown_features": above_features,
+        "root_features": below_features,
+        "upper_mask": above_mask,
+        "below_mask": below_mask,
+    }
+
+def output_paths(file_path, output_stl_folder, output_heatmap_folder, variants=("color",)):
+    """返回 (upper_stl_path, below_stl_path, outputs)，outputs 为该文件的全部输出路径（用于判断能否跳过）"""
     file_name_prefix = os.path.splitext(os.path.basename(file_path))[0]
+    upper_stl_path = os.path.join(output_stl_folder, f"{file_name_prefix}_upper.stl")
+    below_stl_path = os.path.join(output_stl_folder, f"{file_name_prefix}_below.stl")
+    outputs = [upper_stl_path, below_stl_path]
+    for half in ("upper", "below"):
+        outputs.extend(heatmap_paths(output_heatmap_folder, f"{file_name_prefix}_{half}", variants).values())
+    return upper_stl_path, below_stl_path, outputs
+
+def process_single_stl(file_path, output_stl_folder, output_heatmap_folder, params=None, cache=None, labelled=True,
+                       variants=("color",), manifest=None, reporter=None):
+    """
+    处理单个 STL 文件，成功返回 True，失败返回 False。
+    labelled=False 时热力图不创建 matplotlib 图形，由网格经颜色查找表直接写出 PNG；
+    variants 指定每个半模型输出的热力图变体（color / gray / npy / uint16），深度网格只计算一次。
+    传入 ResultCache 时，内容和参数未变化且输出已存在的文件直接跳过；
+    输出缺失时用缓存的几何结果重新生成，不再重复计算长轴、截面和分类。
+    传入 ProgressReporter 时在每个阶段发出进度事件，取消时在阶段边界抛出 ProcessingCancelled（不计为失败）。
+    传入 ManifestWriter 时，文件结束（成功、跳过或失败）后立即追加一条结果记录。
+    """
+    return _process_single_stl(file_path, output_stl_folder, output_heatmap_folder, params, cache, labelled, variants,
+                               manifest, reporter)[0]
+
+def _process_single_stl(file_path, output_stl_folder, output_heatmap_folder, params=None, cache=None, labelled=True,
+                        variants=("color",), manifest=None, reporter=None):
+    """与 process_single_stl 相同，但返回 (是否成功, 错误信息)，批处理据此汇总每个文件的失败原因"""
+    file_name_prefix = os.path.splitext(os.path.basename(file_path))[0]
+    params = DEFAULT_PARAMS if params is None else params
+    reporter = reporter or ProgressReporter(file_path=file_path)
+    start_time = time.time()
+    entry = None
+
+    def record(ok, error=None):
+        if manifest is not None:
+            manifest.write(file_path, ok, error, entry, time.time() - start_time)
+        return ok, error
 
     try:
-        # **1. 加载 STL 文件**
-        model = load_stl(file_path)
+        upper_stl_path, below_stl_path, outputs = output_paths(file_path, output_stl_folder, output_heatmap_folder, variants)
 
-        # **2. 计算牙齿中心和主轴**
-        center, long_axis = compute_long_axis(model)
+        if cache is not None:
+            cache_key = cache.key(file_path, params)
+            entry = cache.get(cache_key)
+            if entry is not None and all(os.path.exists(path) for path in outputs):
+                print(f"⏭️ 文件未变化，跳过: {file_path}")
+                reporter.stage("done")
+                return record(True)
 
-        # **3. 计算最大截面**
-        max_section_points, max_plane_point = find_max_section(model, center, long_axis)
+        # **1. 加载 STL 文件**
+        reporter.stage("load")
+        model = load_stl(file_path, params.get("weld", False))
 
-        if max_plane_point is None:
-            print(f"⚠️ 无法找到有效的最大截面，跳过: {file_path}")
-            return
+        # **2~4. 计算牙齿中心和主轴、最大截面，切割模型**
+        if entry is None:
+            entry = compute_geometry(model, params, reporter)
+            if entry is None:
+                print(f"⚠️ 无法找到有效的最大截面，跳过: {file_path}")
+                return record(False, "无法找到有效的最大截面")
+            if cache is not None:
+                cache.put(cache_key, entry)
 
-        # **4. 切割模型**
-        upper, below = split_model(model, max_plane_point, long_axis)
+        upper = face_subset(mesh_data(model), entry["upper_mask"])
+        below = face_subset(mesh_data(model), entry["below_mask"])
+        max_plane_point, long_axis = entry["max_plane_point"], entry["long_axis"]
 
-        # **5. 保存 STL 文件**
-        upper_stl_path = os.path.join(output_stl_folder, f"{file_name_prefix}_upper.stl")
-        below_stl_path = os.path.join(output_stl_folder, f"{file_name_prefix}_below.stl")
-        save_stl(upper, upper_stl_path)
-        save_stl(below, below_stl_path)
+        with BackgroundStlWriter() as writer:
+            # **5. 保存 STL 文件（后台线程写出，与热力图生成重叠）**
+            reporter.stage("write_stl")
+            writer.write(upper, upper_stl_path)
+            writer.write(below, below_stl_path)
 
-        # **6. 生成并保存热力图**
-        plot_heatmap_on_section(upper.reshape(-1, 3), max_plane_point, long_axis, output_heatmap_folder, f"{file_name_prefix}_upper")
-        plot_heatmap_on_section(below.reshape(-1, 3), max_plane_point, long_axis, output_heatmap_folder, f"{file_name_prefix}_below")
+            # **6. 生成并保存热力图**
+            reporter.stage("heatmap")
+            plot_heatmap_on_section(upper.reshape(-1, 3), max_plane_point, long_axis, output_heatmap_folder, f"{file_name_prefix}_upper",
+                                    labelled=labelled, variants=variants)
+            plot_heatmap_on_section(below.reshape(-1, 3), max_plane_point, long_axis, output_heatmap_folder, f"{file_name_prefix}_below",
+                                    labelled=labelled, variants=variants)
 
+        reporter.stage("done")
         print(f"✅ 单个 STL 处理完成: {file_path}")
+        return record(True)
+    except ProcessingCancelled:
+        print(f"⏹️ 处理已取消: {file_path}")
+        raise
     except Exception as e:
         print(f"❌ 处理失败: {file_path}, 错误: {str(e)}")
+        return record(False, str(e))
+
+def stream_process_stl(file_paths, output_stl_folder, output_heatmap_folder, params=None, cache=None, labelled=True,
+                       variants=("color",), manifest=None, compute_workers=1, render_workers=1, prefetch=2,
+                       queue_size=STREAM_QUEUE_SIZE, reporter=None, instrumentation=None):
+    """
+    流式批处理：读取、计算、写 STL、渲染热力图分别在独立线程中运行，阶段之间用有界队列连接。
+    - 读取线程最多预读 prefetch 个文件：内存映射的二进制 STL 在读取线程中即读入内存，
+      计算线程不会因首次访问缺页而等待磁盘，且在 numpy 运算期间释放 GIL，与磁盘读写重叠；
+    - 写出线程和渲染线程分别消费计算结果，任一队列满时上游阻塞（背压），
+      同时驻留内存的模型数只取决于队列长度和线程数，与输入文件数无关；
+    - 单个文件在某一阶段失败时跳过其后续阶段，不影响其他文件；
+    - 每个文件全部输出完成（或失败）时向 manifest 追加一条记录，reporter 的 callback 收到 "done" 事件；
+      记录中的 seconds 为从开始读取到输出完成的时间，包含在队列中等待的时间；取消后读取线程不再提交新文件，
+      已在途的文件处理完后抛出 ProcessingCancelled；
+    - 传入 Instrumentation 时在各阶段所在的线程中分别测量（不支持 cProfile，内存峰值为近似值）。
+    返回与 file_paths 顺序一致的 [(file_path, 是否成功, 错误信息)] 列表。
+    """
+    params = DEFAULT_PARAMS if params is None else params
+    reporter = reporter or ProgressReporter()
+    instrumentation = instrumentation or Instrumentation()
+    loaded = queue.Queue(maxsize=prefetch)
+    to_write = queue.Queue(maxsize=queue_size)
+    to_render = queue.Queue(maxsize=queue_size)
+    stop = object()
+
+    lock = threading.Lock()
+    results = {}
+    remaining = {}  # file_path -> 尚未完成的输出阶段数（写出 + 渲染）
+    entries = {}  # file_path -> 几何结果，供结果清单使用
+    start_times = {}
+    file_metrics = {}
+    cancelled = threading.Event()
+
+    def finish(file_path, ok, error=None):
+        with lock:
+            if file_path in results:
+                return
+            results[file_path] = (ok, error)
+            completed = len(results)
+            remaining.pop(file_path, None)
+            entry = entries.pop(file_path, None)  # 几何结果含完整的分割掩码，写完记录即释放
+            started = start_times.pop(file_path)
+        if manifest is not None:
+            manifest.write(file_path, ok, error, entry, time.time() - started)
+        if ok:
+            print(f"✅ 单个 STL 处理完成: {file_path}")
+        else:
+            print(f"❌ 处理失败: {file_path}, 错误: {error}")
+        if reporter.callback is not None:
+            reporter.callback(ProgressEvent(file_path, "done", "处理完成", completed / len(file_paths) * 100))
+
+    def output_done(file_path):
+        with lock:
+            if file_path not in remaining:
+                return  # 另一个输出阶段已失败并结束了该文件
+            remaining[file_path] -= 1
+            last = remaining[file_path] == 0
+        if last:
+            finish(file_path, True)
+
+    def read_files():
+        try:
+            for file_path in file_paths:
+                if reporter.cancel_event is not None and reporter.cancel_event.is_set():
+                    cancelled.set()
+                    break
+                start_times[file_path] = time.time()
+                metrics = file_metrics[file_path] = instrumentation.begin(file_path)
+                try:
+                    upper_stl_path, below_stl_path, outputs = output_paths(file_path, output_stl_folder,
+                                                                           output_heatmap_folder, variants)
+                    entry, cache_key = None, None
+                    if cache is not None:
+                        cache_key = cache.key(file_path, params)
+                        entry = cache.get(cache_key)
+                        if entry is not None and all(os.path.exists(path) for path in outputs):
+                            print(f"⏭️ 文件未变化，跳过: {file_path}")
+                            entries[file_path] = entry
+                            finish(file_path, True)
+                            continue
+                    with metrics.stage("load"):
+                        model = load_stl(file_path, params.get("weld", False))
+                        if hasattr(model, "materialize"):
+                            model.materialize()  # 预读文件内容，队列长度限制同时驻留内存的模型数
+                except Exception as e:
+                    finish(file_path, False, str(e))
+                    continue
+                loaded.put((file_path, model, entry, cache_key, upper_stl_path, below_stl_path))
+        finally:
+            for _ in range(compute_workers):
+                loaded.put(stop)
+
+    def compute_files():
+        while True:
+            item = loaded.get()
+            if item is stop:
+                return
+            file_path, model, entry, cache_key, upper_stl_path, below_stl_path = item
+            metrics = file_metrics[file_path]
+            try:
+                if entry is None:
+                    entry = compute_geometry(model, params, ProgressReporter(file_path=file_path, metrics=metrics))
+                    metrics.stop()
+                    if entry is None:
+                        finish(file_path, False, "无法找到有效的最大截面")
+                        continue
+                    if cache is not None:
+                        cache.put(cache_key, entry)
+                entries[file_path] = entry
+                triangles = mesh_data(model)
+                upper = face_subset(triangles, entry["upper_mask"])
+                below = face_subset(triangles, entry["below_mask"])
+            except Exception as e:
+                metrics.stop()
+                finish(file_path, False, str(e))
+                continue
+            del model, triangles
+            with lock:
+                remaining[file_path] = 2
+            to_write.put((file_path, upper, below, upper_stl_path, below_stl_path))
+            to_render.put((file_path, upper, below, entry["max_plane_point"], entry["long_axis"]))
+
+    def write_files():
+        while True:
+            item = to_write.get()
+            if item is stop:
+                return
+            file_path, upper, below, upper_stl_path, below_stl_path = item
+            try:
+                with file_metrics[file_path].stage("write_stl"):
+                    write_stl(upper, upper_stl_path)
+                    write_stl(below, below_stl_path)
+            except Exception as e:
+                finish(file_path, False, str(e))
+                continue
+            output_done(file_path)
+
+    def render_files():
+        while True:
+            item = to_render.get()
+            if item is stop:
+                return
+            file_path, upper, below, max_plane_point, long_axis = item
+            file_name_prefix = os.path.splitext(os.path.basename(file_path))[0]
+            try:
+                with file_metrics[file_path].stage("heatmap"):
+                    for half, part in (("upper", upper), ("below", below)):
+                        plot_heatmap_on_section(part.reshape(-1, 3), max_plane_point, long_axis, output_heatmap_folder,
+                                                f"{file_name_prefix}_{half}", labelled=labelled, variants=variants)
+            except Exception as e:
+                finish(file_path, False, str(e))
+                continue
+            output_done(file_path)
+
+    def start(target, count=1):
+        threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    reader = start(read_files)
+    computers = start(compute_files, compute_workers)
+    writers = start(write_files)
+    renderers = start(render_files, render_workers)
 
-def batch_process_stl(input_folder, output_stl_folder, output_heatmap_folder):
-    """批量处理 STL 文件"""
+    for thread in reader + computers:
+        thread.join()
+    for outbox, consumers in ((to_write, writers), (to_render, renderers)):
+        for _ in consumers:
+            outbox.put(stop)
+        for thread in consumers:
+            thread.join()
+
+    if cancelled.is_set():
+        raise ProcessingCancelled()
+    return [(file_path,) + results.get(file_path, (False, "未处理")) for file_path in file_paths]
+
+@contextmanager
+def _worker_environment():
+    """进程池存续期间临时设置子进程继承的环境变量，结束后恢复"""
+    saved = {name: os.environ.get(name) for name in WORKER_ENVIRONMENT}
+    os.environ.update(WORKER_ENVIRONMENT)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _init_worker():
+    """子进程初始化：已加载的 BLAS 线程池也限制为单线程（需要可选依赖 threadpoolctl）"""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(1)
+
+def _process_chunk(func, chunk, args):
+    """在子进程中依次处理一组文件，单个文件的异常不影响同组其他文件"""
+    results = []
+    for file_path in chunk:
+        try:
+            result = func(file_path, *args)
+            ok, error = result if isinstance(result, tuple) else (result is not False, None)
+            results.append((file_path, ok, error))
+        except Exception as e:
+            results.append((file_path, False, str(e)))
+    return results
+
+def run_in_process_pool(func, file_paths, args=(), workers=None, chunksize=None):
+    """
+    用进程池并行执行 func(file_path, *args)，func 返回 是否成功 或 (是否成功, 错误信息)。
+    - 文件按 chunksize 分组提交，减少进程间通信次数；
+    - 每个文件的失败单独记录，子进程崩溃时只把所在分组记为失败；
+    - 子进程以 spawn 方式启动，WORKER_ENVIRONMENT 在子进程导入 numpy 之前生效，func 必须可按模块路径导入；
+    - 返回与 file_paths 顺序一致的 [(file_path, 是否成功, 错误信息)] 列表。
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(file_paths) // (workers * 4))
+    chunks = [file_paths[i:i + chunksize] for i in range(0, len(file_paths), chunksize)]
+
+    results = []
+    with _worker_environment():
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_process_chunk, func, chunk, args) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    results.extend((file_path, False, str(e)) for file_path in chunk)
+                print(f"📌 进度: {len(results)}/{len(file_paths)} 文件处理完成")
+    return results
+
+def batch_process_stl(input_folder, output_stl_folder, output_heatmap_folder, workers=1, chunksize=None,
+                      cache_dir=None, params=None, labelled=True, variants=("color",), progress=None, cancel_event=None,
+                      stream=False, prefetch=2, manifest_path=None, instrumentation=None):
+    """
+    批量处理 STL 文件。
+    workers > 1 时使用进程池并行处理（None 表示使用全部 CPU 核心）；
+    指定 cache_dir 时启用按内容哈希的结果缓存，未变化的文件直接跳过；
+    labelled=False 时热力图走无 matplotlib 图形的快速输出；
+    variants 同时列出多种热力图变体（如 ("color", "gray")）时，一次运行即可输出全部图像；
+    串行模式下 progress 接收每个文件各阶段的 ProgressEvent，cancel_event 被设置后在阶段边界抛出 ProcessingCancelled；
+    stream=True 时使用读取 / 计算 / 写出 / 渲染重叠的流式处理（见 stream_process_stl），workers 为计算线程数，
+    此时 progress 只接收每个文件完成的事件；
+    指定 manifest_path（.jsonl / .csv）时，每个文件结束后立即向该清单追加一条结果记录，可用 manifest.load_manifest 按列读回；
+    传入 instrumentation.Instrumentation 时记录每个文件各阶段的耗时、CPU 时间、切片次数和内存峰值，
+    结束时打印分位数汇总并写出最慢文件的 cProfile 结果（进程池模式不收集）；
+    返回按文件名排序的 [(file_path, 是否成功, 错误信息)] 列表。
+    """
     if not os.path.exists(input_folder):
         print("❌ 输入文件夹不存在，请检查路径")
         return
@@ -47,7 +489,7 @@ def batch_process_stl(input_folder, output_stl_folder, output_heatmap_folder):
     os.makedirs(output_stl_folder, exist_ok=True)
     os.makedirs(output_heatmap_folder, exist_ok=True)
 
-    stl_files = [f for f in os.listdir(input_folder) if f.endswith(".stl")]
+    stl_files = sorted(f for f in os.listdir(input_folder) if f.endswith(".stl"))
     if not stl_files:
         print("⚠️ 输入文件夹中没有 STL 文件")
         return
@@ -55,9 +497,33 @@ def batch_process_stl(input_folder, output_stl_folder, output_heatmap_folder):
     print(f"🔄 开始处理 {len(stl_files)} 个 STL 文件...")
     start_time = time.time()
 
-    for file_name in stl_files:
-        file_path = os.path.join(input_folder, file_name)
-        process_single_stl(file_path, output_stl_folder, output_heatmap_folder)
+    cache = ResultCache(cache_dir) if cache_dir else None
+    manifest = ManifestWriter(manifest_path) if manifest_path else None
+    args = (output_stl_folder, output_heatmap_folder, params, cache, labelled, variants, manifest)
+
+    file_paths = [os.path.join(input_folder, file_name) for file_name in stl_files]
+    if stream:
+        results = stream_process_stl(file_paths, *args, compute_workers=workers or os.cpu_count() or 1,
+                                     prefetch=prefetch, reporter=ProgressReporter(progress, cancel_event),
+                                     instrumentation=instrumentation)
+    elif workers == 1:
+        reporter = ProgressReporter(progress, cancel_event)
+        collector = instrumentation or Instrumentation()
+        results = []
+        for idx, file_path in enumerate(file_paths):
+            with collector.measure(file_path) as metrics:
+                ok, error = _process_single_stl(file_path, *args,
+                                                reporter=reporter.for_file(file_path, idx, len(file_paths), metrics))
+            results.append((file_path, ok, error))
+    else:
+        results = run_in_process_pool(_process_single_stl, file_paths, args, workers, chunksize)
 
     end_time = time.time()
-    print(f"🎉 批量处理完成，总耗时: {end_time - start_time:.2f} 秒")
+    failed = sum(1 for _, ok, _ in results if not ok)
+    print(f"🎉 批量处理完成，总耗时: {end_time - start_time:.2f} 秒，失败 {failed} 个")
+    if instrumentation is not None:
+        instrumentation.report()
+        for path in instrumentation.dump_profiles():
+            print(f"🐢 性能分析结果已保存: {path}")
+        instrumentation.close()
+    return results
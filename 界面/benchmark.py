@@ -0,0 +1,208 @@
+#性能基准：在确定性的合成网格（椭球、牙冠 + 牙根形状，1k ~ 2M 个三角形）上测量各几何内核与完整的 process_single_stl 流程，
+#结果保存为 JSON 基线，再次运行时与基线比较，超过阈值的变慢视为回归（退出码 1），不需要患者数据
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+from stl_io import write_stl
+from stl_processing import load_stl, extract_part_features
+from section_analysis import compute_long_axis, find_max_section, get_intersection_section, split_model
+from heatmap import rasterize_depth
+from batch_process import process_single_stl
+
+# 默认的网格规模（三角形数）
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 2_000_000)
+
+# 默认的回归阈值：比基线慢 20% 以上视为回归
+DEFAULT_THRESHOLD = 0.2
+
+# 绝对差小于该值（秒）的变慢视为计时噪声
+MIN_REGRESSION_SECONDS = 0.005
+
+# 由半径 / 高度函数生成闭合的旋转体网格
+def _revolution_mesh(triangle_count, radius, height):
+    """
+    在 (t, θ) 网格上取点，t ∈ [0, 1] 从底端极点到顶端极点，radius(t, θ) / height(t, θ) 给出每个点的半径和高度（沿 x 轴）。
+    两端极点处只保留一个三角形，三角形数约为 triangle_count，返回 (N, 3, 3) float32。
+    """
+    rows = max(int(round(np.sqrt(triangle_count / 4))), 2)
+    columns = 2 * rows
+    t = np.linspace(0.0, 1.0, rows + 1)[:, None]
+    theta = np.linspace(0.0, 2 * np.pi, columns, endpoint=False)[None, :]
+    r = np.broadcast_to(radius(t, theta), (rows + 1, columns)).copy()
+    r[[0, -1]] = 0.0  # 极点精确闭合，避免 sin(π) 的舍入误差使焊接后出现缝隙
+    points = np.stack(np.broadcast_arrays(height(t, theta), r * np.cos(theta), r * np.sin(theta)), axis=-1)
+
+    j = np.arange(columns)
+    i = np.arange(rows)[:, None]
+    p00, p01 = points[i, j], points[i, (j + 1) % columns]
+    p10, p11 = points[i + 1, j], points[i + 1, (j + 1) % columns]
+    lower = np.stack((p00, p10, p11), axis=-2)[:-1]  # 顶端极点处 p10 与 p11 重合，去掉
+    upper = np.stack((p00, p11, p01), axis=-2)[1:]   # 底端极点处 p00 与 p01 重合，去掉
+    return np.concatenate((lower.reshape(-1, 3, 3), upper.reshape(-1, 3, 3))).astype(np.float32)
+
+def _smoothstep(edge0, edge1, x):
+    x = np.clip((x - edge0) / (edge1 - edge0), 0.0, 1.0)
+    return x * x * (3 - 2 * x)
+
+# 椭球
+def ellipsoid_mesh(triangle_count, axes=(10.0, 4.0, 5.0)):
+    a, b, c = axes
+    return _revolution_mesh(
+        triangle_count,
+        radius=lambda t, theta: np.sin(np.pi * t) * b * c / np.hypot(c * np.cos(theta), b * np.sin(theta)),
+        height=lambda t, theta: -a * np.cos(np.pi * t) + 0 * theta,
+    )
+
+# 牙冠 + 牙根形状
+def crown_root_mesh(triangle_count, seed=0):
+    """
+    细长的锥形牙根过渡到较宽的牙冠，牙冠顶部有四个牙尖，并叠加固定种子的微小起伏使牙冠比牙根粗糙，
+    整体沿 x 轴，长约 22 mm。
+    """
+    rows = max(int(round(np.sqrt(triangle_count / 4))), 2)
+    noise = np.random.default_rng(seed).standard_normal((rows + 1, 2 * rows))
+
+    def radius(t, theta):
+        crown = _smoothstep(0.55, 0.8, t)
+        width = 2.2 + 2.3 * crown
+        cusps = 1 + 0.08 * np.cos(4 * theta) * _smoothstep(0.7, 1.0, t)
+        rough = 1 + 0.01 * noise * crown
+        return width * np.sin(np.pi * t) ** 0.6 * cusps * rough
+
+    def height(t, theta):
+        return 22.0 * t - 14.0 + 0.8 * np.cos(4 * theta) * _smoothstep(0.7, 0.9, t) * np.sin(np.pi * t)
+
+    return _revolution_mesh(triangle_count, radius, height)
+
+# 合成网格的形状
+SHAPES = {
+    "ellipsoid": ellipsoid_mesh,
+    "crown_root": crown_root_mesh,
+}
+
+# 计时
+def best_time(func, repeat):
+    """运行 repeat 次，返回最短耗时（秒），内核打印的信息被丢弃"""
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+def _kernels(model, stl_path, work_dir):
+    """返回 {内核名: 无参函数}，长轴和最大截面先算一次供后续内核使用"""
+    center, long_axis = compute_long_axis(model)
+    _, plane_point = find_max_section(model, center, long_axis)
+    triangles = model.vectors
+    upper, below = split_model(model, plane_point, long_axis, long_axis)
+    stl_folder = os.path.join(work_dir, "stl")
+    heatmap_folder = os.path.join(work_dir, "heatmap")
+    os.makedirs(stl_folder, exist_ok=True)
+    os.makedirs(heatmap_folder, exist_ok=True)
+    return {
+        "load_stl": lambda: np.asarray(load_stl(stl_path).vectors).sum(),
+        "compute_long_axis": lambda: compute_long_axis(model),
+        "find_max_section": lambda: find_max_section(model, center, long_axis),
+        "find_max_section_bracket": lambda: find_max_section(model, center, long_axis, search="bracket"),
+        "get_intersection_section": lambda: get_intersection_section(model, plane_point, long_axis),
+        "split_model": lambda: split_model(model, plane_point, long_axis, long_axis),
+        "extract_part_features": lambda: (extract_part_features(upper), extract_part_features(below)),
+        "rasterize_depth": lambda: rasterize_depth(triangles, plane_point, long_axis),
+        "process_single_stl": lambda: process_single_stl(stl_path, stl_folder, heatmap_folder),
+    }
+
+# 运行基准
+def run_benchmarks(sizes=DEFAULT_SIZES, shapes=tuple(SHAPES), kernels=None, repeat=3):
+    """
+    返回 {"meta": 运行环境, "results": {"形状/三角形数/内核": {"seconds": 最短耗时, "triangles": 实际三角形数}}}。
+    kernels 为 None 时运行全部内核；合成网格先写成二进制 STL 再加载，与实际处理时的数据路径一致。
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for shape in shapes:
+            for size in sizes:
+                triangles = SHAPES[shape](size)
+                stl_path = os.path.join(work_dir, f"{shape}_{size}.stl")
+                write_stl(triangles, stl_path)
+                model = load_stl(stl_path)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    available = _kernels(model, stl_path, work_dir)
+                for name, func in available.items():
+                    if kernels is not None and name not in kernels:
+                        continue
+                    seconds = best_time(func, repeat)
+                    results[f"{shape}/{size}/{name}"] = {"seconds": seconds, "triangles": len(triangles)}
+                    print(f"⏱️ {shape:<11}{size:>10}  {name:<26}{seconds * 1000:>12.2f} ms")
+                del model, triangles
+    meta = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return {"meta": meta, "results": results}
+
+# 与基线比较
+def compare_to_baseline(current, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    只比较两边都有的条目，返回 [(键, 基线秒数, 当前秒数, 比值)] 的回归列表：
+    当前耗时超过基线 × (1 + threshold)，且绝对差不小于 min_seconds。
+    """
+    regressions = []
+    for key, entry in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            continue
+        before, after = reference["seconds"], entry["seconds"]
+        if after > before * (1 + threshold) and after - before >= min_seconds:
+            regressions.append((key, before, after, after / before))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="STL 处理内核的性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="网格三角形数")
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES), default=list(SHAPES), help="合成网格形状")
+    parser.add_argument("--kernels", nargs="+", help="只运行指定的内核（默认全部）")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最短耗时")
+    parser.add_argument("--output", help="把本次结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="基线 JSON 文件，存在时与之比较")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线文件")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回归阈值（0.2 表示慢 20%%）")
+    parser.add_argument("--min-seconds", type=float, default=MIN_REGRESSION_SECONDS, help="忽略小于该值的绝对差（秒）")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes, args.shapes, args.kernels, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+
+    status = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(current, baseline, args.threshold, args.min_seconds)
+        for key, before, after, ratio in regressions:
+            print(f"❌ 性能回归: {key}  {before * 1000:.2f} ms -> {after * 1000:.2f} ms（{ratio:.2f} 倍）")
+        if regressions:
+            status = 1
+        else:
+            print(f"✅ 与基线相比没有超过 {args.threshold:.0%} 的回归")
+    elif args.baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"📁 基线已保存: {args.baseline}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
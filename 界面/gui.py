@@ -1,14 +1,11 @@
 import os
-import sys
-import time  
 import tkinter as tk
 import batch_process
+from gui_task import BackgroundTask
 from tkinter import filedialog, messagebox, ttk
 import matplotlib.pyplot as plt
 from vtk_viewer import open_vtk_viewer
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from stl_processing import load_stl, save_stl, split_model
-from section_analysis import compute_long_axis, find_max_section, plot_heatmap_on_section
 
 class STLProcessingApp:
     def __init__(self, root):
@@ -104,7 +101,11 @@ class STLProcessingApp:
         """选择 STL 文件（用于三维展示）"""
         self.selected_view_file = filedialog.askopenfilename(filetypes=[("STL Files", "*.stl")])
         if self.selected_view_file:
-            open_vtk_viewer(self.selected_view_file)
+            # 模型发送给常驻查看器进程，调用立即返回
+            try:
+                open_vtk_viewer(self.selected_view_file)
+            except Exception as e:
+                messagebox.showerror("错误", f"打开 STL 文件时出错: {str(e)}")
 
     def select_stl_file(self):
         """选择 STL 文件"""
@@ -155,7 +156,54 @@ class STLProcessingApp:
         except Exception as e:
             messagebox.showerror("错误", f"无法打开投影图: {str(e)}")
 
-    import time  # **导入 time 模块用于模拟进度更新**
+    def create_progress_window(self, text):
+        """创建进度窗口（进度条 + 取消按钮），返回 (窗口, 提示标签, 进度条, 取消按钮)"""
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("处理进度")
+        progress_window.geometry("400x170")
+
+        progress_label = tk.Label(progress_window, text=text)
+        progress_label.pack(pady=10)
+
+        progress_bar = ttk.Progressbar(progress_window, orient="horizontal", length=300, mode="determinate")
+        progress_bar.pack(pady=10, fill=tk.X, padx=20)
+        progress_bar["value"] = 0
+
+        cancel_button = tk.Button(progress_window, text="取消")
+        cancel_button.pack(pady=5)
+        return progress_window, progress_label, progress_bar, cancel_button
+
+    def run_task(self, target, text, on_finished):
+        """
+        在后台线程运行 target(progress, cancel_event)，主线程根据真实的阶段事件更新进度条，
+        处理期间界面保持响应，可随时取消（在下一个阶段边界生效）。
+        """
+        progress_window, progress_label, progress_bar, cancel_button = self.create_progress_window(text)
+
+        def on_progress(event):
+            progress_bar["value"] = event.percent
+            file_name = os.path.basename(event.file_path) if event.file_path else ""
+            progress_label.config(text=f"进度: {event.percent:.0f}%（{event.message}）{file_name}")
+
+        def on_finish(status, result):
+            progress_window.destroy()
+            if status == "cancelled":
+                messagebox.showinfo("已取消", "处理已取消")
+            elif status == "error":
+                messagebox.showerror("错误", f"处理文件时出错: {str(result)}")
+            else:
+                on_finished(result)
+
+        task = BackgroundTask(self.root, target, on_progress, on_finish)
+
+        def cancel():
+            task.cancel()
+            cancel_button.config(state=tk.DISABLED)
+            progress_label.config(text="正在取消，当前阶段完成后停止...")
+
+        cancel_button.config(command=cancel)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+        task.start()
 
     def process_file(self):
         """处理 STL 文件（单独 / 批量），带进度窗口"""
@@ -167,36 +215,20 @@ class STLProcessingApp:
                 messagebox.showwarning("警告", "请先选择 STL 和 热力图的存储位置！")
                 return
 
-            # **创建进度窗口**
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("处理进度")
-            progress_window.geometry("400x150")
+            file_path = self.selected_file
+            stl_folder, heatmap_folder = self.stl_save_directory_single, self.heatmap_save_directory_single
 
-            progress_label = tk.Label(progress_window, text="正在处理，请稍候...")
-            progress_label.pack(pady=10)
+            def process_single(progress, cancel_event):
+                reporter = batch_process.ProgressReporter(progress, cancel_event, file_path)
+                return batch_process.process_single_stl(file_path, stl_folder, heatmap_folder, reporter=reporter)
 
-            progress_bar = ttk.Progressbar(progress_window, orient="horizontal", length=300, mode="determinate")
-            progress_bar.pack(pady=10, fill=tk.X, padx=20)
+            def finished(ok):
+                if ok:
+                    messagebox.showinfo("完成", "单个文件处理完成！")
+                else:
+                    messagebox.showwarning("警告", f"文件处理失败: {file_path}")
 
-            progress_bar["value"] = 0
-            self.root.update_idletasks()
-
-            # **处理 STL 文件，模拟进度更新**
-            for progress in range(1, 100, 2):  # **逐步增加进度**
-                time.sleep(0.5)  # **模拟处理时间**
-                progress_bar["value"] = progress
-                progress_label.config(text=f"进度: {progress}%")
-                self.root.update_idletasks()
-
-            batch_process.process_single_stl(self.selected_file, self.stl_save_directory_single, self.heatmap_save_directory_single)
-
-            # **确保最终 100%**
-            progress_bar["value"] = 100
-            progress_label.config(text="处理完成！")
-            self.root.update_idletasks()
-
-            messagebox.showinfo("完成", "单个文件处理完成！")
-            progress_window.destroy()
+            self.run_task(process_single, "正在处理，请稍候...", finished)
 
         else:
             if not self.selected_folder:
@@ -208,45 +240,22 @@ class STLProcessingApp:
 
             # **获取待处理的 STL 文件数**
             stl_files = [f for f in os.listdir(self.selected_folder) if f.endswith(".stl")]
-            total_files = len(stl_files)
-            if total_files == 0:
+            if len(stl_files) == 0:
                 messagebox.showwarning("警告", "未找到 STL 文件！")
                 return
 
-            # **创建进度窗口**
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("处理进度")
-            progress_window.geometry("400x150")
-
-            progress_label = tk.Label(progress_window, text="正在批量处理，请稍候...")
-            progress_label.pack(pady=10)
+            folder = self.selected_folder
+            stl_folder, heatmap_folder = self.stl_save_directory_batch, self.heatmap_save_directory_batch
 
-            progress_bar = ttk.Progressbar(progress_window, orient="horizontal", length=300, mode="determinate")
-            progress_bar.pack(pady=10, fill=tk.X, padx=20)
+            def process_batch(progress, cancel_event):
+                return batch_process.batch_process_stl(folder, stl_folder, heatmap_folder,
+                                                       progress=progress, cancel_event=cancel_event)
 
-            progress_bar["value"] = 0
-            self.root.update_idletasks()
+            def finished(results):
+                failed = sum(1 for _, ok, _ in results or [] if not ok)
+                messagebox.showinfo("完成", f"批量处理已完成！失败 {failed} 个")
 
-            for idx, file_name in enumerate(stl_files):
-                file_path = os.path.join(self.selected_folder, file_name)
-
-                # **处理 STL 文件**
-                batch_process.process_single_stl(file_path, self.stl_save_directory_batch, self.heatmap_save_directory_batch)
-
-                # **进度条分阶段更新**
-                for progress in range(int((idx / total_files) * 100), int(((idx + 1) / total_files) * 100), 20):
-                    time.sleep(0.3)  # **模拟处理时间**
-                    progress_bar["value"] = progress
-                    progress_label.config(text=f"进度: {progress}%")
-                    self.root.update_idletasks()
-
-            # **确保最终 100%**
-            progress_bar["value"] = 100
-            progress_label.config(text="处理完成！")
-            self.root.update_idletasks()
-
-            messagebox.showinfo("完成", "批量处理已完成！")
-            progress_window.destroy()
+            self.run_task(process_batch, "正在批量处理，请稍候...", finished)
 
 
     def batch_process(self):
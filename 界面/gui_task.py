@@ -0,0 +1,51 @@
+#界面后台任务：在工作线程中运行处理流程，通过队列把进度事件交回 Tk 主线程
+import queue
+import threading
+from batch_process import ProgressEvent, ProcessingCancelled
+
+class BackgroundTask:
+    """
+    在后台线程执行 target(progress, cancel_event)，界面控件只在 Tk 主线程中更新。
+    - progress 为队列的 put 方法，处理流程发出的 ProgressEvent 经 root.after 轮询后交给 on_progress；
+    - 结束时在主线程调用 on_finish(status, result)，status 为 "finished" / "cancelled" / "error"，
+      出错时 result 为异常对象；
+    - cancel() 只设置取消标志，处理流程在下一个阶段边界停止。
+    """
+    def __init__(self, root, target, on_progress, on_finish, poll_ms=100):
+        self.root = root
+        self.target = target
+        self.on_progress = on_progress
+        self.on_finish = on_finish
+        self.poll_ms = poll_ms
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self.root.after(self.poll_ms, self._poll)
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _run(self):
+        try:
+            result = self.target(self.events.put, self.cancel_event)
+            self.events.put(("finished", result))
+        except ProcessingCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as e:
+            self.events.put(("error", e))
+
+    def _poll(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(event, ProgressEvent):
+                self.on_progress(event)
+            else:
+                self.on_finish(*event)
+                return
+        self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,319 @@
+#截面热力图的计算与输出：把三角形投影到截面坐标系 (v1, v2)，用深度缓冲直接光栅化距离场，
+#再经颜色查找表直接写出 PNG / TIFF（不经过 pyplot），带标注的 matplotlib 图作为可选的慢速路径
+import os
+import struct
+import zlib
+import numpy as np
+from mesh_geometry import plane_basis, vertices_and_faces, per_face
+
+# 投影到截面坐标系
+def project_to_plane(vertices, section_point, long_axis):
+    """返回 (x, y, distances)：顶点在 (v1, v2) 上的投影坐标与到截面的带符号距离"""
+    long_axis = np.asarray(long_axis, dtype=np.float64)
+    long_axis = long_axis / np.linalg.norm(long_axis)
+    v1, v2 = plane_basis(long_axis)
+    relative = np.asarray(vertices, dtype=np.float64) - section_point
+    return relative @ v1, relative @ v2, relative @ long_axis
+
+# 三角形光栅化得到深度网格
+def rasterize_depth(triangles, section_point, long_axis, resolution=500, surface="nearest", chunk_size=4000000):
+    """
+    将 (N, 3, 3) 三角形（或 IndexedMesh）投影到截面坐标系，在 resolution × resolution 的网格上按重心坐标插值距离。
+    - 网格范围与原 griddata 实现相同（投影点的包围盒），返回 (grid_x, grid_y, grid_z)；
+    - grid_z 为按全部顶点最小/最大距离归一化到 [0, 1] 的距离，未被覆盖的像素为 NaN；
+    - 同一像素被多层表面覆盖时，surface="nearest" 取离截面最近的一层，"farthest" 取最远的一层。
+    """
+    vertices, faces = vertices_and_faces(triangles)
+    x, y, distances = project_to_plane(vertices, section_point, long_axis)
+    min_distance, max_distance = distances.min(), distances.max()
+    normalized = (distances - min_distance) / (max_distance - min_distance)
+
+    grid_x, grid_y = np.meshgrid(np.linspace(x.min(), x.max(), resolution), np.linspace(y.min(), y.max(), resolution))
+    x0, y0 = x.min(), y.min()
+    dx = (x.max() - x0) / (resolution - 1)
+    dy = (y.max() - y0) / (resolution - 1)
+
+    px, py = per_face(x, faces), per_face(y, faces)
+    depth = per_face(normalized, faces)
+    # 排序键：nearest 取 |d| 最小，farthest 取 |d| 最大（取负后同样取最小）
+    key = per_face(np.abs(distances), faces)
+    if surface == "farthest":
+        key = -key
+
+    # 每个三角形覆盖的像素包围盒
+    i_min = np.clip(np.ceil((px.min(axis=1) - x0) / dx), 0, resolution - 1).astype(np.int64)
+    i_max = np.clip(np.floor((px.max(axis=1) - x0) / dx), 0, resolution - 1).astype(np.int64)
+    j_min = np.clip(np.ceil((py.min(axis=1) - y0) / dy), 0, resolution - 1).astype(np.int64)
+    j_max = np.clip(np.floor((py.max(axis=1) - y0) / dy), 0, resolution - 1).astype(np.int64)
+    widths = np.maximum(i_max - i_min + 1, 0)
+    counts = widths * np.maximum(j_max - j_min + 1, 0)
+
+    # 重心坐标的分母（投影后三角形的有向面积 × 2），退化三角形不参与
+    denom = (px[:, 1] - px[:, 0]) * (py[:, 2] - py[:, 0]) - (px[:, 2] - px[:, 0]) * (py[:, 1] - py[:, 0])
+    counts[np.abs(denom) < 1e-12] = 0
+
+    best_key = np.full(resolution * resolution, np.inf)
+    grid_z = np.full(resolution * resolution, np.nan)
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(px):
+        # 按展开后的候选像素数分块，限制单块内存
+        offset = ends[start - 1] if start > 0 else 0
+        stop = max(int(np.searchsorted(ends, offset + chunk_size, side="right")), start + 1)
+        chunk_counts = counts[start:stop]
+        total = int(chunk_counts.sum())
+        if total > 0:
+            tri = np.repeat(np.arange(start, stop), chunk_counts)
+            local = np.arange(total) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            i = i_min[tri] + local % widths[tri]
+            j = j_min[tri] + local // widths[tri]
+            sx, sy = x0 + i * dx, y0 + j * dy
+
+            ax, ay = px[tri, 0], py[tri, 0]
+            w1 = ((sx - ax) * (py[tri, 2] - ay) - (px[tri, 2] - ax) * (sy - ay)) / denom[tri]
+            w2 = ((px[tri, 1] - ax) * (sy - ay) - (sx - ax) * (py[tri, 1] - ay)) / denom[tri]
+            w0 = 1 - w1 - w2
+            eps = -1e-9
+            inside = (w0 >= eps) & (w1 >= eps) & (w2 >= eps)
+
+            tri, w0, w1, w2 = tri[inside], w0[inside], w1[inside], w2[inside]
+            pixels = (j * resolution + i)[inside]
+            weights = np.stack((w0, w1, w2), axis=1)
+            values = np.einsum("ij,ij->i", weights, depth[tri])
+            keys = np.einsum("ij,ij->i", weights, key[tri])
+
+            # 每个像素先在块内取键值最小的一层，再与已有结果比较
+            order = np.lexsort((keys, pixels))
+            pixels, keys, values = pixels[order], keys[order], values[order]
+            first = np.ones(len(pixels), dtype=bool)
+            first[1:] = pixels[1:] != pixels[:-1]
+            pixels, keys, values = pixels[first], keys[first], values[first]
+            better = keys < best_key[pixels]
+            best_key[pixels[better]] = keys[better]
+            grid_z[pixels[better]] = values[better]
+        start = stop
+
+    return grid_x, grid_y, grid_z.reshape(resolution, resolution)
+
+# 生成颜色查找表
+def colormap_lut(cmap, size=256):
+    """返回 (size, 4) 的 uint8 RGBA 查找表；"gray" 不依赖 matplotlib，其余名称从 matplotlib 的色表注册表中读取"""
+    if cmap == "gray":
+        ramp = np.linspace(0, 255, size).round().astype(np.uint8)
+        return np.column_stack((ramp, ramp, ramp, np.full(size, 255, dtype=np.uint8)))
+    from matplotlib import colormaps
+    return (colormaps[cmap](np.linspace(0, 1, size)) * 255).round().astype(np.uint8)
+
+# 深度网格转换为 RGBA 图像
+def grid_to_rgba(grid_z, cmap="RdYlBu_r", size=256):
+    """
+    将 [0, 1] 的深度网格经查找表映射为 RGBA 图像。
+    网格第 0 行对应 y 最小处，图像按 contourf 的朝向上下翻转；NaN（模型投影之外）为透明像素。
+    """
+    grid_z = np.flipud(grid_z)
+    valid = ~np.isnan(grid_z)
+    index = np.zeros(grid_z.shape, dtype=np.intp)
+    index[valid] = np.clip(grid_z[valid] * (size - 1) + 0.5, 0, size - 1).astype(np.intp)
+    image = colormap_lut(cmap, size)[index]
+    image[~valid] = 0
+    return image
+
+# 深度网格转换为 16 位灰度
+def grid_to_uint16(grid_z):
+    """[0, 1] 映射到 0~65535，图像朝向同 grid_to_rgba；NaN 记为 0"""
+    grid_z = np.flipud(grid_z)
+    return np.round(np.nan_to_num(np.clip(grid_z, 0, 1), nan=0.0) * 65535).astype(np.uint16)
+
+# 直接写出 PNG
+def write_png(file_path, image, compress_level=6):
+    """写出 8 位灰度 / 灰度+透明 / RGB / RGBA 或 16 位灰度的 PNG，只依赖 zlib"""
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+    if image.dtype == np.uint16:
+        bit_depth, data = 16, image.astype(">u2")
+    else:
+        bit_depth, data = 8, image.astype(np.uint8, copy=False)
+
+    # 每行前加一个字节的过滤类型（0 = 不过滤）
+    rows = data.reshape(height, -1).view(np.uint8)
+    raw = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+
+    def chunk(tag, payload):
+        return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload) & 0xFFFFFFFF)
+
+    with open(file_path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), compress_level)))
+        f.write(chunk(b"IEND", b""))
+
+# 直接写出 TIFF
+def write_tiff(file_path, image):
+    """写出未压缩、单条带的 8 位或 16 位灰度 TIFF（小端）"""
+    image = np.ascontiguousarray(image)
+    height, width = image.shape
+    bits = 16 if image.dtype == np.uint16 else 8
+    data = image.astype("<u2" if bits == 16 else np.uint8, copy=False).tobytes()
+
+    # (标签, 类型, 值)，类型 3 = SHORT，4 = LONG；标签须按升序排列
+    entries = [(256, 4, width), (257, 4, height), (258, 3, bits), (259, 3, 1), (262, 3, 1),
+               (273, 4, 0), (277, 3, 1), (278, 4, height), (279, 4, len(data))]
+    data_offset = 8 + 2 + len(entries) * 12 + 4
+    ifd = struct.pack("<H", len(entries))
+    for tag, kind, value in entries:
+        if tag == 273:
+            value = data_offset
+        if kind == 3:
+            ifd += struct.pack("<HHIHH", tag, kind, 1, value, 0)
+        else:
+            ifd += struct.pack("<HHII", tag, kind, 1, value)
+    ifd += struct.pack("<I", 0)
+
+    with open(file_path, "wb") as f:
+        f.write(b"II" + struct.pack("<HI", 42, 8))
+        f.write(ifd)
+        f.write(data)
+
+# 无界面快速输出
+def save_heatmap_image(grid_z, file_path, cmap="RdYlBu_r"):
+    """
+    不创建 matplotlib 图形，直接由数组写出热力图：
+    - .tif / .tiff 写 16 位归一化灰度；
+    - 其他扩展名写按 cmap 着色的 RGBA PNG。
+    """
+    if file_path.lower().endswith((".tif", ".tiff")):
+        write_tiff(file_path, grid_to_uint16(grid_z))
+    else:
+        write_png(file_path, grid_to_rgba(grid_z, cmap))
+
+# 带坐标轴、标题的 matplotlib 图（慢速路径）
+def save_heatmap_figure(grid_x, grid_y, grid_z, file_path, title, cmap, colorbar_label=None, show_grid=True,
+                        levels=100, **savefig_kwargs):
+    """使用面向对象的 Figure + Agg 画布绘制等值填充图，不涉及 pyplot 的全局状态，可在线程中调用"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(8, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    contour = ax.contourf(grid_x, grid_y, grid_z, levels=np.linspace(0, 1, levels), cmap=cmap)
+    if colorbar_label is not None:
+        fig.colorbar(contour, ax=ax, label=colorbar_label)
+    ax.set_title(title)
+    ax.set_xlabel("X-axis (projected)")
+    ax.set_ylabel("Y-axis (projected)")
+    ax.axis("equal")
+    ax.grid(show_grid)
+    fig.savefig(file_path, **savefig_kwargs)
+
+# 每种输出变体对应的文件名后缀
+HEATMAP_VARIANTS = {
+    "color": "_heatmap.png",         # RdYlBu_r 着色图
+    "gray": "_gray_heatmap.png",     # 灰度图
+    "npy": "_heatmap.npy",           # 原始 float32 深度网格（含 NaN）
+    "uint16": "_heatmap_16bit.tif",  # 归一化 16 位灰度 TIFF
+    "pyramid": "_heatmap_pyramid.npz",  # 多分辨率深度网格金字塔
+}
+
+# 金字塔中除最细层（光栅化分辨率）之外的各层边长
+DEFAULT_PYRAMID_LEVELS = (250, 125, 64)
+
+# 着色图 / 灰度图在带标注模式下的绘图参数
+FIGURE_STYLES = {
+    "color": dict(title="{label} Model Heatmap", cmap="RdYlBu_r",
+                  colorbar_label="Normalized Distance to Section Plane (Z-axis)"),
+    "gray": dict(title="{label} Model Heatmap (Grayscale)", cmap="gray", show_grid=False,
+                 dpi=300, bbox_inches="tight"),
+}
+
+# 各变体的输出路径
+def heatmap_paths(output_path, label, variants=("color",)):
+    """返回 {变体: 文件路径}，可用于判断输出是否已存在"""
+    unknown = set(variants) - set(HEATMAP_VARIANTS)
+    if unknown:
+        raise ValueError(f"未知的热力图变体: {sorted(unknown)}")
+    return {variant: os.path.join(output_path, f"{label}{HEATMAP_VARIANTS[variant]}") for variant in variants}
+
+# 深度网格降采样
+def downsample_grid(grid_z, resolution):
+    """
+    按面积平均把深度网格降采样为 resolution × resolution（支持非整数倍），NaN 不参与平均；
+    一个粗像素覆盖的细像素全部为 NaN 时结果为 NaN。
+    """
+    rows, cols = grid_z.shape
+    row_index = np.arange(rows) * resolution // rows
+    col_index = np.arange(cols) * resolution // cols
+    cells = (row_index[:, None] * resolution + col_index[None, :]).ravel()
+
+    values = grid_z.ravel()
+    valid = ~np.isnan(values)
+    sums = np.bincount(cells[valid], weights=values[valid], minlength=resolution * resolution)
+    counts = np.bincount(cells[valid], minlength=resolution * resolution)
+    coarse = np.full(resolution * resolution, np.nan)
+    np.divide(sums, counts, out=coarse, where=counts > 0)
+    return coarse.reshape(resolution, resolution)
+
+# 构建分辨率金字塔
+def build_heatmap_pyramid(grid_z, levels=DEFAULT_PYRAMID_LEVELS):
+    """返回 {边长: float32 网格}，包含原始网格和 levels 中的各层，每层都由最细网格直接降采样"""
+    finest = grid_z.shape[0]
+    if any(level > finest for level in levels):
+        raise ValueError(f"金字塔层的分辨率不能超过光栅化分辨率 {finest}")
+    pyramid = {finest: grid_z.astype(np.float32)}
+    for level in sorted(set(levels) - {finest}, reverse=True):
+        pyramid[level] = downsample_grid(grid_z, level).astype(np.float32)
+    return pyramid
+
+# 保存金字塔
+def save_heatmap_pyramid(file_path, pyramid):
+    """每层保存为 .npz 中的一个独立成员（不压缩），读取时可只解出需要的一层"""
+    with open(file_path, "wb") as f:
+        np.savez(f, **{f"level_{level}": grid for level, grid in pyramid.items()})
+
+# 列出金字塔的层
+def heatmap_pyramid_levels(file_path):
+    """返回升序排列的各层边长，只读取 .npz 目录，不解出数据"""
+    with np.load(file_path) as data:
+        return sorted(int(name.split("_")[1]) for name in data.files)
+
+# 读取金字塔中的一层
+def load_heatmap_level(file_path, resolution=None):
+    """
+    读取不小于 resolution 的最粗一层（resolution 为 None 或超过最细层时返回最细层），
+    返回 [0, 1] 归一化的 float32 深度网格，可再用 grid_to_rgba 生成缩略图。
+    """
+    with np.load(file_path) as data:
+        levels = sorted(int(name.split("_")[1]) for name in data.files)
+        candidates = [level for level in levels if resolution is not None and level >= resolution]
+        level = candidates[0] if candidates else levels[-1]
+        return data[f"level_{level}"]
+
+# 由一次光栅化的深度网格输出多种热力图
+def render_heatmaps(vertices, section_point, long_axis, output_path, label, variants=("color",), surface="nearest",
+                    labelled=True, resolution=500, pyramid_levels=DEFAULT_PYRAMID_LEVELS):
+    """
+    对一个半模型只计算一次 resolution × resolution 的深度网格，然后按 variants 依次写出 color / gray / npy / uint16 / pyramid。
+    labelled=True 时 color、gray 为带坐标轴的 matplotlib 图，否则直接由网格写出 PNG；
+    pyramid 由该网格降采样出 pyramid_levels 中的各层；返回 {变体: 文件路径}。
+    """
+    paths = heatmap_paths(output_path, label, variants)
+    triangles = vertices if hasattr(vertices, "faces") else np.reshape(vertices, (-1, 3, 3))  # 展平顶点或 IndexedMesh
+    grid_x, grid_y, grid_z = rasterize_depth(triangles, section_point, long_axis, resolution, surface)
+
+    for variant, file_path in paths.items():
+        if variant == "npy":
+            np.save(file_path, grid_z.astype(np.float32))
+        elif variant == "uint16":
+            write_tiff(file_path, grid_to_uint16(grid_z))
+        elif variant == "pyramid":
+            save_heatmap_pyramid(file_path, build_heatmap_pyramid(grid_z, pyramid_levels))
+        elif labelled:
+            style = dict(FIGURE_STYLES[variant])
+            title = style.pop("title").format(label=label)
+            save_heatmap_figure(grid_x, grid_y, grid_z, file_path, title, **style)
+        else:
+            save_heatmap_image(grid_z, file_path, FIGURE_STYLES[variant]["cmap"])
+    return paths
@@ -0,0 +1,114 @@
+#索引网格：唯一顶点 (float32) + 面索引 (int32)，由三角形汤按容差焊接共享顶点得到，并提供边-面邻接
+from functools import cached_property
+import numpy as np
+from stl_io import read_stl
+
+# 按容差焊接顶点
+def weld_vertices(triangles, tolerance=1e-5):
+    """
+    把 (N, 3, 3) 三角形的顶点量化到边长为 tolerance 的网格上，同一格内的顶点合并为一个。
+    返回 (vertices, faces)：vertices 取每组第一次出现的坐标，faces[i] 与 triangles[i] 一一对应（不删除退化面）。
+    """
+    points = np.asarray(triangles, dtype=np.float32).reshape(-1, 3)
+    if len(points) == 0:
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3), dtype=np.int32)
+
+    keys = np.floor(points / tolerance).astype(np.int64)
+    keys -= keys.min(axis=0)
+    spans = keys.max(axis=0) + 1
+    if float(spans[0]) * float(spans[1]) * float(spans[2]) < 2.0 ** 62:
+        # 三个格坐标合成一个 int64 键，一维去重比按行去重快得多
+        keys = (keys[:, 0] * spans[1] + keys[:, 1]) * spans[2] + keys[:, 2]
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return points[first], inverse.reshape(-1, 3).astype(np.int32)
+
+# 由面索引构建边-面邻接
+def edge_face_pairs(faces):
+    """
+    对全部面的三条边做向量化哈希（较小顶点号 × 顶点数 + 较大顶点号），排序后相同的相邻键即共享同一条边的两个面。
+    返回 (edges, pairs)：edges 为 (P, 2) 的共享边顶点下标，pairs 为 (P, 2) 的相邻面下标；
+    非流形边上的 k 个面按排序依次配成 k - 1 对。
+    """
+    faces = np.asarray(faces, dtype=np.int64)
+    if len(faces) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty((0, 2), dtype=np.int64)
+
+    edges = np.sort(np.stack((faces, np.roll(faces, -1, axis=1)), axis=2).reshape(-1, 2), axis=1)  # (3F, 2)
+    keys = edges[:, 0] * (int(edges.max()) + 1) + edges[:, 1]
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    same = np.flatnonzero(keys[1:] == keys[:-1])
+    face_ids = order // 3
+    pairs = np.stack((face_ids[same], face_ids[same + 1]), axis=1)
+    keep = pairs[:, 0] != pairs[:, 1]  # 退化面的两条边可能相同，排除自身配对
+    return edges[order[same]][keep], pairs[keep]
+
+class IndexedMesh:
+    """
+    紧凑的索引网格：闭合网格的顶点数约为面数的一半，内存约为 float32 三角形汤的 1/2、float64 的 1/4。
+    - vertices: (V, 3) float32，faces: (F, 3) int32，面的顺序与原 STL 中三角形的顺序一致；
+    - mesh_geometry、heatmap 和 stl_processing 中的函数可直接接收 IndexedMesh，
+      按顶点计算一次距离 / 投影后再按面索引取值；
+    - vectors 与 StlMesh 兼容，但会展开为完整的 (F, 3, 3) 数组，只在需要三角形汤时使用；
+    - 面法向量、边-面邻接和相邻面夹角在第一次访问时计算并缓存在网格上，构建后不应再修改 vertices / faces。
+    """
+    def __init__(self, vertices, faces, name=""):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int32)
+        self.name = name
+
+    @classmethod
+    def from_triangles(cls, triangles, tolerance=1e-5, name=""):
+        """由 (N, 3, 3) 三角形焊接构建"""
+        vertices, faces = weld_vertices(triangles, tolerance)
+        return cls(vertices, faces, name)
+
+    def face_vertices(self, index=slice(None)):
+        """按面下标或布尔掩码取出 (k, 3, 3) 的三角形顶点"""
+        return self.vertices[self.faces[index]]
+
+    def submesh(self, index):
+        """按面下标或布尔掩码取出部分面，顶点数组共享不复制"""
+        return IndexedMesh(self.vertices, self.faces[index], self.name)
+
+    @cached_property
+    def face_normals(self):
+        """(F, 3) 单位面法向量，退化面为 NaN"""
+        triangles = self.vertices[self.faces].astype(np.float64)
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+    @cached_property
+    def adjacency(self):
+        """(edges, pairs)：共享边与相邻面对，见 edge_face_pairs"""
+        return edge_face_pairs(self.faces)
+
+    @cached_property
+    def dihedral_angles(self):
+        """全部相邻面对的法向量夹角（弧度，即二面角的补角，平坦处为 0），退化面不参与"""
+        pairs = self.adjacency[1]
+        normals = self.face_normals
+        cosines = np.einsum("ij,ij->i", normals[pairs[:, 0]], normals[pairs[:, 1]])
+        angles = np.arccos(np.clip(cosines, -1.0, 1.0))
+        return angles[~np.isnan(angles)]
+
+    @property
+    def vectors(self):
+        return self.face_vertices()
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.faces.nbytes
+
+    def __len__(self):
+        return len(self.faces)
+
+# 加载 STL 为索引网格
+def load_indexed_stl(file_path, tolerance=1e-5):
+    """读取 STL 后焊接顶点，面顺序与文件中的三角形顺序一致"""
+    model = read_stl(file_path)
+    return IndexedMesh.from_triangles(model.vectors, tolerance, model.name)
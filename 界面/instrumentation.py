@@ -0,0 +1,184 @@
+#处理流程的分阶段测量：每个文件每个阶段的墙钟时间、CPU 时间、峰值内存分配（tracemalloc）和计数（如切片次数），
+#批处理结束后输出分位数汇总，并可为最慢的若干个文件保存 cProfile 结果
+import cProfile
+import heapq
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+
+# 汇总时输出的分位数
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+class FileMetrics:
+    """
+    单个文件的测量结果：stages 为 {阶段名: {"wall": 秒, "cpu": 秒, "peak_bytes": 字节}}，counters 为 {名称: 数值}。
+    - start(name) 结束当前阶段并开始新阶段，stop() 结束当前阶段，供 ProgressReporter 在阶段边界调用；
+    - stage(name) 为上下文管理器，用于阶段在不同线程中执行的流式处理；
+    - CPU 时间按线程统计；峰值内存为阶段内超出阶段开始时已分配内存的最大值，
+      tracemalloc 是进程全局的，多个线程同时处理文件时只能作为近似值。
+    """
+    def __init__(self, file_path, trace_memory=False):
+        self.file_path = file_path
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        self._current = None
+
+    def _begin(self):
+        baseline = 0
+        if self.trace_memory:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        return time.perf_counter(), time.thread_time(), baseline
+
+    def _end(self, name, begin):
+        wall, cpu, baseline = begin
+        values = {"wall": time.perf_counter() - wall, "cpu": time.thread_time() - cpu}
+        if self.trace_memory:
+            values["peak_bytes"] = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+        self.stages[name] = values
+
+    def start(self, name):
+        self.stop()
+        self._current = (name, self._begin())
+
+    def stop(self):
+        if self._current is not None:
+            self._end(*self._current)
+            self._current = None
+
+    @contextmanager
+    def stage(self, name):
+        begin = self._begin()
+        try:
+            yield self
+        finally:
+            self._end(name, begin)
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    @property
+    def wall(self):
+        return sum(values["wall"] for values in self.stages.values())
+
+class Instrumentation:
+    """
+    收集一次批处理中全部文件的 FileMetrics 并汇总。
+    - trace_memory=True 时启动 tracemalloc 记录各阶段峰值分配（有明显的额外开销，默认关闭）；
+    - profile_slowest=N 时用 cProfile 分析每个文件，只保留墙钟时间最长的 N 个，
+      由 dump_profiles() 写成 profile_dir 下的 .pstats 文件（只在串行处理时可用）。
+    """
+    def __init__(self, trace_memory=False, profile_slowest=0, profile_dir="profiles"):
+        self.trace_memory = trace_memory
+        self.profile_slowest = profile_slowest
+        self.profile_dir = profile_dir
+        self.files = []
+        self.profiles = []  # 小顶堆：(墙钟时间, 序号, 文件路径, pstats.Stats)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._started_tracing = False
+
+    def begin(self, file_path):
+        """开始记录一个文件，返回其 FileMetrics"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        metrics = FileMetrics(file_path, self.trace_memory)
+        with self._lock:
+            self.files.append(metrics)
+        return metrics
+
+    @contextmanager
+    def measure(self, file_path):
+        """测量一个文件的完整处理过程，启用 profile_slowest 时同时用 cProfile 分析"""
+        metrics = self.begin(file_path)
+        profiler = cProfile.Profile() if self.profile_slowest else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield metrics
+        finally:
+            metrics.stop()
+            if profiler is not None:
+                profiler.disable()
+                self._keep_profile(metrics, profiler)
+
+    def _keep_profile(self, metrics, profiler):
+        item = (metrics.wall, next(self._counter), metrics.file_path, pstats.Stats(profiler))
+        with self._lock:
+            if len(self.profiles) < self.profile_slowest:
+                heapq.heappush(self.profiles, item)
+            elif item[0] > self.profiles[0][0]:
+                heapq.heapreplace(self.profiles, item)
+
+    def dump_profiles(self):
+        """把最慢的 N 个文件的分析结果写为 .pstats（按耗时从高到低编号），返回文件路径列表"""
+        if not self.profiles:
+            return []
+        os.makedirs(self.profile_dir, exist_ok=True)
+        paths = []
+        for rank, (_, _, file_path, stats) in enumerate(sorted(self.profiles, reverse=True), 1):
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            path = os.path.join(self.profile_dir, f"{rank:02d}_{name}.pstats")
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def summary(self, percentiles=SUMMARY_PERCENTILES):
+        """
+        返回 {阶段名: {指标名: {"p50": ..., "mean": ..., "max": ...}}}，阶段按首次出现的顺序排列；
+        "total" 为每个文件全部阶段的墙钟时间之和，计数（如 slices）以 "counters" 下的同名键给出。
+        """
+        def describe(values):
+            values = np.asarray(values, dtype=np.float64)
+            result = {f"p{p}": float(np.percentile(values, p)) for p in percentiles}
+            result.update(mean=float(values.mean()), max=float(values.max()), count=len(values))
+            return result
+
+        samples = {}
+        counters = {}
+        for metrics in self.files:
+            for stage, values in metrics.stages.items():
+                for metric, value in values.items():
+                    samples.setdefault(stage, {}).setdefault(metric, []).append(value)
+            for name, value in metrics.counters.items():
+                counters.setdefault(name, []).append(value)
+
+        result = {stage: {metric: describe(values) for metric, values in metrics.items()}
+                  for stage, metrics in samples.items()}
+        if self.files:
+            result["total"] = {"wall": describe([metrics.wall for metrics in self.files])}
+        if counters:
+            result["counters"] = {name: describe(values) for name, values in counters.items()}
+        return result
+
+    def report(self, percentiles=SUMMARY_PERCENTILES):
+        """打印分位数汇总表"""
+        summary = self.summary(percentiles)
+        if not summary:
+            return summary
+        columns = [f"p{p}" for p in percentiles] + ["max"]
+        print(f"📊 分阶段统计（{len(self.files)} 个文件）")
+        print(f"{'阶段':<14}{'指标':<12}" + "".join(f"{column:>12}" for column in columns))
+        for stage, metrics in summary.items():
+            for metric, values in metrics.items():
+                if metric == "peak_bytes":
+                    cells = [f"{values[column] / 2 ** 20:>10.1f}MB" for column in columns]
+                elif stage == "counters":
+                    cells = [f"{values[column]:>12.0f}" for column in columns]
+                else:
+                    cells = [f"{values[column] * 1000:>10.1f}ms" for column in columns]
+                print(f"{stage:<14}{metric:<12}" + "".join(cells))
+        return summary
+
+    def close(self):
+        """停止由本对象启动的 tracemalloc"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
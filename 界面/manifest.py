@@ -0,0 +1,151 @@
+#批处理结果清单：每个文件处理完成后立即追加一条记录（JSONL / CSV），可选导出 Parquet，并可按列读回做统计分析
+import csv
+import io
+import json
+import os
+import numpy as np
+from stl_processing import PART_FEATURE_DTYPE, feature_score
+
+# 清单字段（顺序即 CSV 列顺序）；数值字段缺失时为空，读回后为 NaN
+MANIFEST_FIELDS = (
+    ["file", "ok", "error", "seconds"]
+    + [f"centroid_{axis}" for axis in "xyz"]
+    + [f"long_axis_{axis}" for axis in "xyz"]
+    + [f"plane_point_{axis}" for axis in "xyz"]
+    + ["section_area"]
+    + [f"{part}_{name}" for part in ("crown", "root") for name in PART_FEATURE_DTYPE.names + ("score",)]
+)
+
+# 非数值字段
+TEXT_FIELDS = ("file", "error")
+BOOL_FIELDS = ("ok",)
+
+# 由处理结果生成一条清单记录
+def manifest_record(file_path, ok, error=None, entry=None, seconds=None):
+    """
+    entry 为 compute_geometry / 结果缓存返回的几何结果字典，失败时可为 None；
+    返回按 MANIFEST_FIELDS 排列的字典，数组展开为 _x / _y / _z 列。
+    """
+    record = dict.fromkeys(MANIFEST_FIELDS)
+    record.update(file=file_path, ok=bool(ok), error=error, seconds=None if seconds is None else round(float(seconds), 6))
+    if entry is None:
+        return record
+
+    for name, key in (("centroid", "centroid"), ("long_axis", "long_axis"), ("plane_point", "max_plane_point")):
+        if entry.get(key) is not None:
+            for axis, value in zip("xyz", np.asarray(entry[key], dtype=np.float64).ravel()):
+                record[f"{name}_{axis}"] = float(value)
+    if entry.get("section_area") is not None:
+        record["section_area"] = float(entry["section_area"])
+    for part in ("crown", "root"):
+        features = entry.get(f"{part}_features")
+        if features is None:
+            continue
+        for name in PART_FEATURE_DTYPE.names:
+            record[f"{part}_{name}"] = float(features[name])
+        record[f"{part}_score"] = float(feature_score(features))
+    return record
+
+class ManifestWriter:
+    """
+    追加写入的结果清单，格式由扩展名决定（.jsonl 或 .csv）。
+    - 每条记录编码后以一次 os.write 追加到以 O_APPEND 打开的文件，
+      多线程 / 多进程同时写入时记录不会交错，写入后立即可见，批处理中途退出也不会丢失已完成的记录；
+    - CSV 只在文件为空时写表头，同一清单可以跨多次运行累积；
+    - 只保存路径，可直接传给进程池中的子进程。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.format = manifest_format(path)
+        if self.format not in ("jsonl", "csv"):
+            raise ValueError(f"清单只能流式写入 .jsonl 或 .csv，Parquet 请用 export_parquet() 导出: {path}")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if self.format == "csv" and (not os.path.exists(path) or os.path.getsize(path) == 0):
+            self._append(self._csv_line(dict(zip(MANIFEST_FIELDS, MANIFEST_FIELDS))))
+
+    def _csv_line(self, record):
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, MANIFEST_FIELDS, lineterminator="\n").writerow(record)
+        return buffer.getvalue()
+
+    def _append(self, text):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, text.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def write(self, file_path, ok, error=None, entry=None, seconds=None):
+        """追加一条记录，参数同 manifest_record"""
+        record = manifest_record(file_path, ok, error, entry, seconds)
+        if self.format == "csv":
+            self._append(self._csv_line(record))
+        else:
+            self._append(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+# 由扩展名判断清单格式
+def manifest_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {".jsonl": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}.get(extension, extension)
+
+def _read_records(path):
+    """逐条读取 JSONL / CSV 记录；中途中断时写了一半的最后一行被忽略"""
+    records = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if manifest_format(path) == "csv":
+            for row in csv.DictReader(f):
+                if None in row or any(row.get(name) is None for name in MANIFEST_FIELDS):
+                    continue
+                row["ok"] = row["ok"] == "True"
+                records.append(row)
+        else:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("读写 Parquet 需要安装 pyarrow") from None
+    return pyarrow
+
+# 按列读回清单
+def load_manifest(path):
+    """
+    读取 JSONL / CSV / Parquet 清单，返回 {字段名: numpy 数组}：
+    file / error 为字符串（object）数组，ok 为布尔数组，其余为 float64（缺失为 NaN）。
+    """
+    if manifest_format(path) == "parquet":
+        pyarrow = _require_pyarrow()
+        table = pyarrow.parquet.read_table(path)
+        records = table.to_pylist()
+    else:
+        records = _read_records(path)
+
+    columns = {}
+    for name in MANIFEST_FIELDS:
+        values = [record.get(name) for record in records]
+        if name in TEXT_FIELDS:
+            columns[name] = np.array([value if value not in ("", None) else None for value in values], dtype=object)
+        elif name in BOOL_FIELDS:
+            columns[name] = np.array([bool(value) for value in values], dtype=bool)
+        else:
+            columns[name] = np.array([float(value) if value not in ("", None) else np.nan for value in values],
+                                     dtype=np.float64)
+    return columns
+
+# 导出 Parquet
+def export_parquet(manifest_path, parquet_path):
+    """把 JSONL / CSV 清单转换为 Parquet（需要可选依赖 pyarrow），返回记录数"""
+    pyarrow = _require_pyarrow()
+    columns = load_manifest(manifest_path)
+    table = pyarrow.table({name: pyarrow.array(columns[name].tolist()) for name in MANIFEST_FIELDS})
+    pyarrow.parquet.write_table(table, parquet_path)
+    return table.num_rows
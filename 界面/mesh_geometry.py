@@ -0,0 +1,566 @@
+#牙齿 STL 模型的批量几何计算内核（基于 NumPy 的向量化实现，供各模块共用）
+from functools import cached_property
+import numpy as np
+from scipy.optimize import minimize_scalar
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from indexed_mesh import weld_vertices
+
+# 以下函数的 triangles 参数既可以是 (N, 3, 3) 三角形数组，也可以是 indexed_mesh.IndexedMesh
+# （带 vertices / faces 属性），后者按唯一顶点计算一次，再按面索引取值
+
+# 取模型的几何数据
+def mesh_data(model):
+    """IndexedMesh 原样返回，其他模型（StlMesh、numpy-stl）返回 (N, 3, 3) 的 vectors"""
+    return model if hasattr(model, "faces") else model.vectors
+
+# 拆成顶点与面索引
+def vertices_and_faces(triangles):
+    """IndexedMesh 返回 (唯一顶点, 面索引)，三角形数组返回 ((3N, 3) 顶点, None)"""
+    if hasattr(triangles, "faces"):
+        return triangles.vertices, triangles.faces
+    return np.asarray(triangles).reshape(-1, 3), None
+
+# 按面取出逐顶点的量
+def per_face(values, faces):
+    """values 为逐顶点的量 (V, ...)，返回 (F, 3, ...)"""
+    if faces is None:
+        return values.reshape(-1, 3, *values.shape[1:])
+    return values[faces]
+
+# 取出部分面的三角形顶点
+def face_subset(triangles, index):
+    if hasattr(triangles, "faces"):
+        return triangles.face_vertices(index)
+    return np.asarray(triangles)[index]
+
+# 批量计算三角形与平面的交线段
+def intersect_triangles(triangles, plane_point, plane_normal):
+    """
+    计算全部三角形与平面的交线段，返回 (N, 2, 3) 的线段端点数组。
+    - 顶点按带符号距离 d > 0 / d <= 0 分为两侧（与 split_model 的判定一致），
+      每个跨越平面的三角形恰好有两条边跨越，得到一条线段。
+    - 位于平面内的边只会被其上方的相邻三角形输出一次，不会出现 0/0 的除法。
+    """
+    vertices, faces = vertices_and_faces(triangles)
+    if len(vertices) == 0:
+        return np.empty((0, 2, 3))
+
+    plane_normal = np.asarray(plane_normal, dtype=np.float64)
+    distances = per_face((vertices - plane_point) @ plane_normal, faces)  # (N, 3) 顶点带符号距离
+    if faces is None:
+        return _edge_crossings(vertices.reshape(-1, 3, 3), distances)
+
+    # 索引网格只展开跨越平面的面
+    above = distances > 0
+    crossing = above.any(axis=1) & ~above.all(axis=1)
+    return _edge_crossings(vertices[faces[crossing]], distances[crossing])
+
+# 由顶点带符号距离求每个三角形的两个交点
+def _edge_crossings(vertices, distances):
+    """vertices 为 (N, 3, k) 的顶点坐标（k 维均可），distances 为 (N, 3)，返回 (M, 2, k)"""
+    # 边 (i, i+1) 的起点与终点
+    next_vertices = np.roll(vertices, -1, axis=1)
+    next_distances = np.roll(distances, -1, axis=1)
+
+    above = distances > 0
+    crossing = above != np.roll(above, -1, axis=1)  # (N, 3) 跨越平面的边
+    if not crossing.any():
+        return np.empty((0, 2, vertices.shape[2]))
+
+    # 跨越的边两端一定分居平面两侧，分母非零
+    d1 = distances[crossing]
+    d2 = next_distances[crossing]
+    p1 = vertices[crossing]
+    p2 = next_vertices[crossing]
+
+    # 统一从下侧端点插值到上侧端点，共享边在相邻三角形中得到逐位相同的交点，便于后续拼接轮廓
+    swap = d1 > 0
+    d1, d2 = np.where(swap, d2, d1), np.where(swap, d1, d2)
+    p1, p2 = np.where(swap[:, None], p2, p1), np.where(swap[:, None], p1, p2)
+    t = d1 / (d1 - d2)
+    points = p1 + t[:, None] * (p2 - p1)
+
+    # 按行优先顺序取出，每个三角形恰好两个交点
+    return points.reshape(-1, 2, vertices.shape[2])
+
+# 平面内的正交基
+def plane_basis(plane_normal):
+    """返回平面内的单位正交基 (v1, v2)，满足 v1 × v2 = 单位法向量（与热力图投影一致）"""
+    plane_normal = np.asarray(plane_normal, dtype=np.float64)
+    plane_normal = plane_normal / np.linalg.norm(plane_normal)
+    arbitrary_vec = np.array([1, 0, 0]) if abs(plane_normal[0]) < 0.9 else np.array([0, 1, 0])
+    v1 = np.cross(plane_normal, arbitrary_vec)
+    v1 = v1 / np.linalg.norm(v1)
+    v2 = np.cross(plane_normal, v1)
+    return v1, v2
+
+# 统一三角形绕向
+def face_orientation_signs(triangles, tolerance=1e-5):
+    """
+    返回 (N,) 的 ±1，乘到每个三角形的法向量上后，同一连通分量内的绕向一致；
+    网格不闭合（存在只属于一个面的边界边）或无法一致定向时返回 None，此时截线不一定闭合，只能逐平面拼接轮廓。
+    - 三角形汤先按容差焊接顶点，共享边在两个面中同向即为绕向不一致；
+    - 约束 flip[i] xor flip[j] = 是否同向 用 2N 个节点的图（每个面的“保持 / 翻转”两个状态）求连通分量一次解出，
+      同一个面的两个状态落在同一分量中即无法定向（如非流形边上的矛盾）；
+    - 每个连通分量保留原文件中多数面的绕向，只翻转少数不一致的面；
+    - 之后按有向体积把外层分量统一为外法向，包围盒位于其他分量内部的分量（如空腔）保持文件中的绕向。
+    """
+    vertices, faces = vertices_and_faces(triangles)
+    corners = per_face(vertices, faces)
+    if faces is None:
+        _, faces = weld_vertices(triangles, tolerance)
+    faces = np.asarray(faces, dtype=np.int64)
+    count = len(faces)
+    signs = np.ones(count)
+    if count == 0:
+        return signs
+
+    start, end = faces.ravel(), np.roll(faces, -1, axis=1).ravel()
+    lo, hi = np.minimum(start, end), np.maximum(start, end)
+    valid = np.flatnonzero(lo != hi)  # 退化面的零长度边不参与
+    keys = lo[valid] * (int(hi.max()) + 1) + hi[valid]
+    sorter = np.argsort(keys, kind="stable")
+    order, keys = valid[sorter], keys[sorter]
+
+    # 边界边：排序后与前后都不相同的边（开口扫描、破洞）
+    boundary = np.ones(len(keys), dtype=bool)
+    boundary[1:] &= keys[1:] != keys[:-1]
+    boundary[:-1] &= keys[:-1] != keys[1:]
+    if boundary.any():
+        return None
+
+    same = np.flatnonzero(keys[1:] == keys[:-1])
+    first, second = order[same], order[same + 1]
+    fi, fj = first // 3, second // 3
+    keep = fi != fj
+    fi, fj = fi[keep], fj[keep]
+    forward = start < end
+    conflict = forward[first[keep]] == forward[second[keep]]
+
+    if conflict.any():
+        rows = np.concatenate((fi, fi + count))
+        cols = np.concatenate((np.where(conflict, fj + count, fj), np.where(conflict, fj, fj + count)))
+        graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(2 * count, 2 * count))
+        _, labels = connected_components(graph, directed=False)
+        keep_state, flip_state = labels[:count], labels[count:]
+        if np.any(keep_state == flip_state):
+            return None
+        flip = keep_state > flip_state
+        _, component = np.unique(np.minimum(keep_state, flip_state), return_inverse=True)
+        components = int(component.max()) + 1
+        flipped = np.bincount(component, weights=flip, minlength=components)
+        total = np.bincount(component, minlength=components)
+        flip ^= (flipped * 2 > total)[component]  # 多数面翻转时整体取反，保留原文件的主要绕向
+    else:
+        graph = coo_matrix((np.ones(len(fi), dtype=np.int8), (fi, fj)), shape=(count, count))
+        components, component = connected_components(graph, directed=False)
+        flip = np.zeros(count, dtype=bool)
+    signs[flip] = -1.0
+
+    # 外层分量按有向体积统一为外法向
+    corners = np.asarray(corners, dtype=np.float64).reshape(-1, 3, 3)
+    corners = corners - corners.reshape(-1, 3).mean(axis=0)
+    volumes = np.einsum("ij,ij->i", corners[:, 0], np.cross(corners[:, 1], corners[:, 2])) * signs
+    volumes = np.bincount(component, weights=volumes, minlength=components)
+    if components == 1:
+        inverted = volumes < 0
+    else:
+        order = np.argsort(component, kind="stable")
+        boundaries = np.searchsorted(component[order], np.arange(components))
+        points = corners[order]
+        lower = np.minimum.reduceat(points.min(axis=1), boundaries)
+        upper = np.maximum.reduceat(points.max(axis=1), boundaries)
+        if components <= 2000:
+            inside = (np.all(lower[:, None] > lower[None, :], axis=2) &
+                      np.all(upper[:, None] < upper[None, :], axis=2)).any(axis=1)
+        else:
+            inside = np.zeros(components, dtype=bool)  # 碎片过多时不判断嵌套
+        inverted = (volumes < 0) & ~inside
+    signs[inverted[component]] *= -1.0
+    return signs
+
+# 逐平面拼接轮廓计算截面面积（开口或无法统一绕向时的回退）
+def _contour_area_profile(index, heights):
+    """index 为 SliceIndex，每个平面只对候选三角形求交"""
+    axis_norm2 = float(np.dot(index.axis, index.axis))
+    areas = np.zeros(len(heights))
+    for i, h in enumerate(heights):
+        segments = index.intersect(index.axis * (h / axis_norm2))
+        areas[i] = section_area(segments, index.axis) if len(segments) else 0.0
+    return areas
+
+# 沿长轴的三角形区间索引
+class SliceIndex:
+    """
+    按三角形在某一轴向上的投影区间 [lo, hi] 建立的索引，每个模型 + 轴只需构建一次。
+    - 区间按 lo 排序，并记录最大区间跨度，查询某一高度时只需二分出
+      lo ∈ [h - max_span, h] 的一段候选，再用 hi 过滤，代价与截面附近的三角形数成正比。
+    - 查询平面的法向量必须是构建索引时的轴向。
+    """
+    def __init__(self, triangles, axis):
+        self.triangles = triangles if hasattr(triangles, "faces") else np.asarray(triangles)
+        self.axis = np.asarray(axis, dtype=np.float64)
+
+        vertices, faces = vertices_and_faces(self.triangles)
+        projections = per_face(vertices @ self.axis, faces)  # (N, 3)
+        lo = projections.min(axis=1)
+        hi = projections.max(axis=1)
+
+        self.order = np.argsort(lo, kind="stable")
+        self.lo = lo[self.order]
+        self.hi = hi[self.order]
+        self.max_span = float((self.hi - self.lo).max()) if len(self.lo) else 0.0
+
+    def height(self, plane_point):
+        """平面在索引轴上的高度"""
+        return float(np.dot(plane_point, self.axis))
+
+    def query(self, plane_point):
+        """返回可能与平面相交的三角形下标（原始顺序中的下标）"""
+        h = self.height(plane_point)
+        return self.query_range(h, h)
+
+    def query_range(self, low, high):
+        """返回可能与高度在 [low, high] 内任一平面相交的三角形下标"""
+        eps = 1e-9 * max(1.0, abs(low), abs(high))  # 留出浮点余量，精确判定交给相交内核
+        start = np.searchsorted(self.lo, low - self.max_span - eps, side="left")
+        stop = np.searchsorted(self.lo, high + eps, side="right")
+        band = slice(start, stop)
+        hit = self.hi[band] > low - eps
+        return self.order[band][hit]
+
+    def intersect(self, plane_point):
+        """只对候选三角形求交，返回 (N, 2, 3) 的线段端点数组"""
+        candidates = face_subset(self.triangles, self.query(plane_point))
+        return intersect_triangles(candidates, plane_point, self.axis)
+
+    @cached_property
+    def face_signs(self):
+        """整个模型统一绕向用的 ±1（见 face_orientation_signs），第一次计算面积时求一次，开口网格为 None"""
+        return face_orientation_signs(self.triangles)
+
+    def profile(self, heights):
+        """
+        多个高度处的截面面积：闭合网格只对高度范围内的候选三角形做一次扫描（section_area_profile），
+        开口或无法统一绕向的网格逐平面拼接轮廓。
+        """
+        heights = np.asarray(heights, dtype=np.float64)
+        if len(heights) == 0:
+            return np.zeros(0)
+        if self.face_signs is None:
+            return _contour_area_profile(self, heights)
+        ids = self.query_range(heights.min(), heights.max())
+        _, areas = section_area_profile(face_subset(self.triangles, ids), self.axis, heights,
+                                        face_signs=self.face_signs[ids])
+        return areas
+
+    def area(self, plane_point):
+        """只对候选三角形计算平面处的截面面积"""
+        return float(self.profile([self.height(plane_point)])[0])
+
+# 沿轴向的截面面积曲线（一次扫描）
+def section_area_profile(triangles, axis, heights=None, origin=None, chunk_size=4000000, face_signs=None):
+    """
+    一次扫描计算沿 axis 各高度处的截面面积，返回 (heights, areas) 两个 NumPy 数组。
+    - 高度与 SliceIndex.height 相同，为平面上一点与 axis 的点积；
+      heights 为 None 时在每个顶点事件高度处求值，否则按给定顺序返回。
+    - 三角形按区间 [lo, hi) 覆盖的高度事件展开为 (三角形, 高度) 对，按块批量求交，
+      总代价约为 O(k·band)，不需要逐个平面扫描整个模型。
+    - 每条交线段按三角形绕向定向后直接累加鞋带公式，闭合网格上即为精确面积（含孔洞），与 origin 无关；
+      绕向先经 face_orientation_signs 统一（也可由 face_signs 传入已算好的结果），
+      网格开口或无法统一绕向时截线不闭合，回退为逐平面拼接轮廓的 section_area。
+    """
+    vertices, faces = vertices_and_faces(triangles)
+    axis = np.asarray(axis, dtype=np.float64)
+    v1, v2 = plane_basis(axis)
+
+    if origin is None:
+        origin = vertices.mean(axis=0) if len(vertices) else np.zeros(3)
+    vertex_relative = vertices - origin  # 平移到模型附近，减小鞋带公式的舍入误差
+    relative = per_face(vertex_relative, faces)  # (N, 3, 3)
+    projections = per_face(vertex_relative @ axis, faces)  # (N, 3)
+    planar = per_face(np.stack((vertex_relative @ v1, vertex_relative @ v2), axis=-1), faces)  # (N, 3, 2)
+    base_height = float(np.dot(origin, axis))
+
+    if heights is None:
+        heights = np.unique(projections) + base_height
+    heights = np.asarray(heights, dtype=np.float64)
+    areas = np.zeros(len(heights))
+    if len(relative) == 0 or len(heights) == 0:
+        return heights, areas
+    if face_signs is None:
+        face_signs = face_orientation_signs(triangles)
+        if face_signs is None:
+            return heights, _contour_area_profile(SliceIndex(triangles, axis), heights)
+
+    order = np.argsort(heights, kind="stable")
+    sorted_heights = heights[order] - base_height
+
+    # 每个三角形覆盖的高度事件 lo <= h < hi（与 d > 0 / d <= 0 的分侧规则一致）
+    first = np.searchsorted(sorted_heights, projections.min(axis=1), side="left")
+    last = np.searchsorted(sorted_heights, projections.max(axis=1), side="left")
+    counts = last - first
+
+    # 截线段的正方向：平面法向 × 三角形法向，使外法向网格的轮廓为逆时针
+    face_normals = np.cross(relative[:, 1] - relative[:, 0], relative[:, 2] - relative[:, 0])
+    face_normals *= np.asarray(face_signs, dtype=np.float64)[:, None]
+    tangents = np.cross(axis, face_normals)
+    tangents = np.stack((tangents @ v1, tangents @ v2), axis=-1)  # (N, 2)
+
+    sums = np.zeros(len(heights))
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(relative):
+        # 按展开后的对数分块，限制单块内存
+        offset = ends[start - 1] if start > 0 else 0
+        stop = max(int(np.searchsorted(ends, offset + chunk_size, side="right")), start + 1)
+        chunk_counts = counts[start:stop]
+        total = int(chunk_counts.sum())
+        if total > 0:
+            tri_ids = np.repeat(np.arange(start, stop), chunk_counts)
+            local = np.arange(total) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            height_ids = first[tri_ids] + local
+
+            distances = projections[tri_ids] - sorted_heights[height_ids][:, None]
+            segments = _edge_crossings(planar[tri_ids], distances)  # (P, 2, 2)
+
+            p, q = segments[:, 0], segments[:, 1]
+            flip = np.einsum("ij,ij->i", q - p, tangents[tri_ids]) < 0
+            p, q = np.where(flip[:, None], q, p), np.where(flip[:, None], p, q)
+            cross = p[:, 0] * q[:, 1] - p[:, 1] * q[:, 0]
+            sums += np.bincount(height_ids, weights=cross, minlength=len(heights))
+        start = stop
+
+    areas[order] = np.abs(0.5 * sums)
+    return heights, areas
+
+# 粗扫 + Brent 搜索最大截面
+def search_max_section(index, tolerance=0.05, coarse_samples=6):
+    """
+    在索引轴向上搜索截面面积最大的高度，返回 (height, area, evaluations)。
+    - 先在模型轴向范围内均匀粗扫 coarse_samples 个平面，取最大值两侧的采样点作为区间；
+    - 再在区间内用有界 Brent 法（黄金分割 + 抛物线插值）收缩，
+      直到高度误差不超过 tolerance（轴向为单位向量时单位即 mm）。
+    - evaluations 为实际计算的切片次数，一般牙齿模型在 20 次以内。
+    """
+    axis_norm = np.linalg.norm(index.axis)
+    h_min, h_max = index.lo[0], index.hi.max()
+
+    heights = np.linspace(h_min, h_max, coarse_samples + 2)
+    areas = np.concatenate(([0.0], index.profile(heights[1:-1]), [0.0]))  # 模型两端截面面积为 0
+    evaluations = coarse_samples
+
+    best = int(np.argmax(areas))
+    best_height, best_area = heights[best], areas[best]
+    bounds = (heights[max(best - 1, 0)], heights[min(best + 1, len(heights) - 1)])
+
+    def negative_area(h):
+        nonlocal evaluations, best_height, best_area
+        evaluations += 1
+        area = index.area(index.axis * (h / axis_norm ** 2))
+        if area > best_area:
+            best_height, best_area = h, area
+        return -area
+
+    # 高度以 axis 点积计，容差换算到同一尺度
+    minimize_scalar(negative_area, bounds=bounds, method="bounded",
+                    options={"xatol": tolerance * axis_norm})
+
+    return float(best_height), float(best_area), evaluations
+
+# 将截面线段按端点哈希拼接为轮廓
+def chain_contours(segments):
+    """
+    把 (N, 2, 3) 的无序线段按共享端点拼接成有序折线，返回轮廓列表（每个为 (k, 3) 数组）。
+    - 端点用 np.unique 做哈希分组，拼接过程对线段数为线性时间；
+    - 闭合轮廓首尾不重复存储，非流形或开口网格产生的开放折线也会原样返回。
+    """
+    segments = np.asarray(segments)
+    if len(segments) == 0:
+        return []
+
+    points, nodes = np.unique(segments.reshape(-1, 3), axis=0, return_inverse=True)
+    nodes = nodes.reshape(-1, 2)
+
+    # CSR 形式的 节点 -> 相邻线段 表
+    incident = np.argsort(nodes.ravel(), kind="stable") // 2
+    starts = np.searchsorted(np.sort(nodes.ravel()), np.arange(len(points) + 1))
+    visited = np.zeros(len(nodes), dtype=bool)
+
+    def walk(node, chain):
+        # 沿未访问的线段一直走到闭合或断开
+        while True:
+            for seg in incident[starts[node]:starts[node + 1]]:
+                if not visited[seg]:
+                    break
+            else:
+                return
+            visited[seg] = True
+            a, b = nodes[seg]
+            node = b if a == node else a
+            chain.append(node)
+
+    contours = []
+    for seg in range(len(nodes)):
+        if visited[seg]:
+            continue
+        visited[seg] = True
+        head, tail = nodes[seg]
+        forward = [head, tail]
+        walk(tail, forward)
+        if forward[-1] == head:
+            forward.pop()  # 闭合轮廓
+        else:
+            backward = []
+            walk(head, backward)  # 开放折线，反向补全另一端
+            forward = backward[::-1] + forward
+        contours.append(points[forward])
+    return contours
+
+# 射线法判断点是否在多边形内
+def _point_in_polygon(point, polygon):
+    x, y = point
+    xi, yi = polygon[:, 0], polygon[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    straddle = (yi > y) != (yj > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = xi + (y - yi) * (xj - xi) / (yj - yi)
+    return np.count_nonzero(straddle & (x < x_cross)) % 2 == 1
+
+# 由轮廓计算截面面积
+def section_area(segments, plane_normal=None, return_contours=False):
+    """
+    拼接截面线段后，在平面二维坐标系内用鞋带公式计算面积，支持多个轮廓和孔洞。
+    - plane_normal 为 None 时用 SVD 从截面点估计平面法向量；
+    - 每个轮廓按被其他轮廓包含的层数确定正负（外轮廓加、孔洞减）；
+    - return_contours=True 时同时返回有序轮廓列表。
+    """
+    segments = np.asarray(segments)
+    contours = chain_contours(segments)
+    contours = [c for c in contours if len(c) >= 3]
+    if not contours:
+        return (0.0, []) if return_contours else 0.0
+
+    if plane_normal is None:
+        points = segments.reshape(-1, 3)
+        plane_normal = np.linalg.svd(points - points.mean(axis=0), full_matrices=False)[2][-1]
+    v1, v2 = plane_basis(plane_normal)
+    origin = segments.reshape(-1, 3).mean(axis=0)
+
+    polygons = []
+    for contour in contours:
+        relative = contour - origin
+        polygons.append(np.stack((relative @ v1, relative @ v2), axis=-1))
+
+    area = 0.0
+    for i, polygon in enumerate(polygons):
+        x, y = polygon[:, 0], polygon[:, 1]
+        loop_area = abs(0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+        depth = sum(_point_in_polygon(polygon[0], other) for j, other in enumerate(polygons) if j != i)
+        area += loop_area if depth % 2 == 0 else -loop_area
+
+    area = abs(area)
+    return (area, contours) if return_contours else area
+
+# 平面两侧整三角形的掩码
+def split_masks(triangles, plane_point, plane_normal):
+    """返回 (above_mask, below_mask)，与 split_triangles(clip=False) 的分组一致，便于缓存和复用"""
+    vertices, faces = vertices_and_faces(triangles)
+    distances = per_face((vertices - plane_point) @ np.asarray(plane_normal, dtype=np.float64), faces)
+    above_count = np.count_nonzero(distances > 0, axis=1)
+    return above_count == 3, above_count == 0
+
+# 按平面分割三角形
+def split_triangles(triangles, plane_point, plane_normal, clip=False):
+    """
+    用一次矩阵乘法和布尔掩码把三角形分到平面两侧，返回连续的 (N, 3, 3) 数组 (above, below)。
+    - 顶点 d > 0 记为上侧，否则为下侧；三个顶点同侧的三角形直接归入对应一侧。
+    - clip=False 时跨越平面的三角形被丢弃（与原实现一致）；
+      clip=True 时将其沿平面切开：孤立顶点一侧得到 1 个三角形，另一侧得到 2 个，
+      两侧共用同一组交点，保持原绕向，切口在平面上严丝合缝。
+    """
+    vertices, faces = vertices_and_faces(triangles)
+    plane_normal = np.asarray(plane_normal, dtype=np.float64)
+    distances = per_face((vertices - plane_point) @ plane_normal, faces)
+    above_count = np.count_nonzero(distances > 0, axis=1)
+
+    above = face_subset(triangles, above_count == 3)
+    below = face_subset(triangles, above_count == 0)
+    if not clip:
+        return above, below
+
+    crossing = (above_count == 1) | (above_count == 2)
+    if not crossing.any():
+        return above, below
+    tris = face_subset(triangles, crossing)
+    dists = distances[crossing]
+    lonely_above = above_count[crossing] == 1
+
+    # 把孤立顶点（独自在一侧的顶点）轮换到第 0 位，轮换不改变绕向
+    lonely_side = np.where(lonely_above[:, None], dists > 0, dists <= 0)
+    first = np.argmax(lonely_side, axis=1)
+    order = (first[:, None] + np.arange(3)) % 3
+    tris = np.take_along_axis(tris, order[:, :, None], axis=1)
+    dists = np.take_along_axis(dists, order, axis=1)
+
+    a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+    da, db, dc = dists[:, 0], dists[:, 1], dists[:, 2]
+
+    def cut(p1, p2, d1, d2):
+        # 与 _edge_crossings 相同，统一从下侧端点插值，相邻三角形得到相同的交点
+        swap = d1 > 0
+        d1, d2 = np.where(swap, d2, d1), np.where(swap, d1, d2)
+        p1, p2 = np.where(swap[:, None], p2, p1), np.where(swap[:, None], p1, p2)
+        t = d1 / (d1 - d2)
+        return (p1 + t[:, None] * (p2 - p1)).astype(vertices.dtype)
+
+    p = cut(a, b, da, db)
+    q = cut(a, c, da, dc)
+    single = np.stack((a, p, q), axis=1)  # 孤立顶点一侧
+    quad = np.concatenate((np.stack((p, b, c), axis=1), np.stack((p, c, q), axis=1)))
+    quad_above = np.concatenate((~lonely_above, ~lonely_above))
+
+    # 顶点恰好落在平面上时会产生退化三角形，直接丢弃
+    def valid(pieces):
+        return ~(np.all(pieces[:, 0] == pieces[:, 1], axis=1) |
+                 np.all(pieces[:, 1] == pieces[:, 2], axis=1) |
+                 np.all(pieces[:, 2] == pieces[:, 0], axis=1))
+
+    single_ok, quad_ok = valid(single), valid(quad)
+    above = np.concatenate((above, single[lonely_above & single_ok], quad[quad_above & quad_ok]))
+    below = np.concatenate((below, single[~lonely_above & single_ok], quad[~quad_above & quad_ok]))
+    return above, below
+
+# 计算质心与惯性张量主轴
+def principal_long_axis(triangles, area_weighted=False):
+    """
+    一次向量化的二阶矩计算得到惯性张量，用对称矩阵特征分解 (eigh) 求主轴，返回 (centroid, long_axis)。
+    - 缺省按全部顶点等权计算（与原逐顶点循环结果相同，共享顶点按出现次数计入；
+      传入 IndexedMesh 时每个焊接后的顶点只计一次）；
+    - area_weighted=True 时对三角形面片按面积精确积分，网格疏密不均不会使主轴偏向密集区域。
+    - 与原实现一致，取最大特征值对应的特征向量。
+    """
+    vertices, faces = vertices_and_faces(triangles)
+    vertices = vertices.astype(np.float64)
+
+    if area_weighted:
+        triangles = per_face(vertices, faces)
+        areas = 0.5 * np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0],
+                                              triangles[:, 2] - triangles[:, 0]), axis=1)
+        centroid = np.einsum("n,nj->j", areas, triangles.mean(axis=1)) / areas.sum()
+        relative = triangles - centroid
+        corner_sum = relative.sum(axis=1)
+        # 三角形上的面积分：∫ r rᵀ dA = A / 12 · (Σ r_i r_iᵀ + (Σ r_i)(Σ r_i)ᵀ)
+        second_moment = (np.einsum("n,nki,nkj->ij", areas, relative, relative) +
+                         np.einsum("n,ni,nj->ij", areas, corner_sum, corner_sum)) / 12
+    else:
+        centroid = vertices.mean(axis=0)
+        relative = vertices - centroid
+        second_moment = relative.T @ relative
+
+    inertia_tensor = np.trace(second_moment) * np.eye(3) - second_moment
+    eigvals, eigvecs = np.linalg.eigh(inertia_tensor)
+    long_axis = eigvecs[:, np.argmax(eigvals)]  # 最大特征值对应的特征向量
+
+    return centroid, long_axis
@@ -0,0 +1,133 @@
+#按 STL 内容哈希缓存单个文件的几何计算结果（质心、长轴、最大截面、分割掩码、牙冠 / 牙根特征）
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+# 几何算法版本号，算法结果发生变化时递增，旧版本的缓存会被自动清除
+ALGORITHM_VERSION = 2
+
+# 缓存的数组字段
+CACHE_FIELDS = ("centroid", "long_axis", "max_plane_point", "section_area", "crown_features", "root_features",
+                "upper_mask", "below_mask")
+
+# 缓存写在每个版本目录中的标记文件，只有带标记的 v<版本号> 目录才会被当作旧缓存删除
+CACHE_MARKER = ".stl_result_cache"
+
+# 版本目录名
+VERSION_DIR_PATTERN = re.compile(r"v\d+")
+
+# 计算文件内容哈希
+def file_digest(file_path, block_size=1 << 20):
+    """分块读取文件，返回 SHA-256 十六进制摘要"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    磁盘结果缓存，键为 STL 内容哈希 + 算法参数 + 算法版本。
+    - 每条记录保存为一个 .npz 文件，分割掩码按位压缩存储；
+    - 命中时刷新文件修改时间，超过 max_bytes 后按修改时间淘汰最久未使用的记录（LRU）；
+    - 缓存目录按算法版本分子目录，版本变化时删除旧版本目录中的缓存文件，也可调用 invalidate() 手动清空；
+      只处理名称为 v<数字> 且带有 CACHE_MARKER 标记的目录，cache_dir 下的其他文件和文件夹不受影响。
+    """
+    def __init__(self, cache_dir, max_bytes=2 << 30, version=ALGORITHM_VERSION):
+        self.root = cache_dir
+        self.version = version
+        self.max_bytes = max_bytes
+        self.cache_dir = os.path.join(cache_dir, f"v{version}")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, CACHE_MARKER), "a"):
+            pass
+        self._remove_stale_versions()
+
+    def _remove_stale_versions(self):
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if (not VERSION_DIR_PATTERN.fullmatch(name) or path == self.cache_dir
+                    or not os.path.isfile(os.path.join(path, CACHE_MARKER))):
+                continue
+            self._clear(path)
+            try:
+                os.remove(os.path.join(path, CACHE_MARKER))
+                os.rmdir(path)
+            except OSError:
+                pass  # 其他进程已删除，或目录中还有缓存以外的文件
+
+    @staticmethod
+    def _clear(directory):
+        """只删除缓存自己写的 .npz 记录和未完成的临时文件"""
+        for name in os.listdir(directory):
+            if not name.endswith((".npz", ".tmp")):
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass  # 其他进程已删除
+
+    def key(self, file_path, params):
+        """由文件内容与算法参数生成缓存键"""
+        payload = json.dumps({"file": file_digest(file_path), "params": params, "version": self.version},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """读取缓存，未命中返回 None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                count = int(data["count"])
+                entry = {name: data[name] for name in CACHE_FIELDS if not name.endswith("_mask")}
+                entry["section_area"] = float(entry["section_area"])
+                for name in ("upper_mask", "below_mask"):
+                    entry[name] = np.unpackbits(data[name], count=count).astype(bool)
+            os.utime(path)  # 记录最近一次访问，供 LRU 淘汰
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        """写入缓存（先写临时文件再原子替换），然后按容量上限淘汰旧记录"""
+        arrays = {name: np.asarray(entry[name]) for name in CACHE_FIELDS if not name.endswith("_mask")}
+        arrays["count"] = np.asarray(len(entry["upper_mask"]))
+        for name in ("upper_mask", "below_mask"):
+            arrays[name] = np.packbits(np.asarray(entry[name], dtype=bool))
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def invalidate(self):
+        """清空当前版本的全部缓存"""
+        self._clear(self.cache_dir)
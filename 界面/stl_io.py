@@ -0,0 +1,168 @@
+#STL 文件的快速读写：二进制 STL 通过 np.memmap 零拷贝映射，ASCII STL 逐行流式解析，写出时一次性写入全部记录
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+import numpy as np
+
+# 二进制 STL 的文件头长度（80 字节说明 + 4 字节三角形数量）
+HEADER_SIZE = 84
+
+# 二进制 STL 的 50 字节三角形记录
+STL_RECORD_DTYPE = np.dtype([
+    ("normals", "<f4", (3,)),
+    ("vectors", "<f4", (3, 3)),
+    ("attr", "<u2"),
+])
+
+class StlMesh:
+    """
+    与 numpy-stl 的 mesh.Mesh 用法兼容的轻量网格，提供 vectors (N, 3, 3) 与 normals (N, 3)。
+    对二进制文件，二者都是映射到文件上的只读视图，不会复制数据。
+    """
+    def __init__(self, data, name=""):
+        self.data = data
+        self.name = name
+
+    @property
+    def vectors(self):
+        return self.data["vectors"]
+
+    @property
+    def normals(self):
+        return self.data["normals"]
+
+    def __len__(self):
+        return len(self.data)
+
+    def materialize(self):
+        """把内存映射的记录一次性读入内存（真正的磁盘读取发生在这里，而不是之后的首次访问），返回 self"""
+        if isinstance(self.data, np.memmap):
+            self.data = np.array(self.data)
+        return self
+
+# 二进制 STL 文件头中的三角形数量
+def _binary_facet_count(file_path):
+    """文件不足以容纳文件头声明的三角形时返回 None"""
+    size = os.path.getsize(file_path)
+    if size < HEADER_SIZE:
+        return None
+    with open(file_path, "rb") as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    return count if size >= HEADER_SIZE + count * STL_RECORD_DTYPE.itemsize else None
+
+# 判断文件开头是否为 ASCII STL 文本
+def _looks_like_ascii(file_path, sample_size=1024):
+    """以 solid 开头、可按 ASCII 解码并出现 facet / endsolid 关键字（二进制文件头同样可能以 solid 开头）"""
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_size)
+    if not sample.lstrip().startswith(b"solid"):
+        return False
+    try:
+        text = sample.decode("ascii")
+    except UnicodeDecodeError:
+        return False
+    return "facet" in text or "endsolid" in text
+
+# 判断是否为二进制 STL
+def is_binary_stl(file_path):
+    """
+    长度恰好为 84 + 50 × 三角形数量时为二进制；文件更长（末尾有填充或附加数据）时，
+    只要内容不是 ASCII 文本也按二进制读取文件头声明的三角形
+    """
+    count = _binary_facet_count(file_path)
+    if count is None:
+        return False
+    if os.path.getsize(file_path) == HEADER_SIZE + count * STL_RECORD_DTYPE.itemsize:
+        return True
+    return not _looks_like_ascii(file_path)
+
+# 流式解析 ASCII STL
+def _read_ascii_stl(file_path):
+    """逐行读取 facet normal / vertex 记录，不需要一次性载入整个文本"""
+    normals, vertices = array("f"), array("f")
+    with open(file_path, "r", errors="replace") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == "vertex":
+                vertices.extend(map(float, parts[1:4]))
+            elif parts[0] == "facet" and len(parts) >= 5:
+                normals.extend(map(float, parts[2:5]))
+
+    count = len(vertices) // 9
+    data = np.zeros(count, dtype=STL_RECORD_DTYPE)
+    if count > 0:
+        data["vectors"] = np.frombuffer(vertices, dtype=np.float32)[:count * 9].reshape(-1, 3, 3)
+        if len(normals) == count * 3:
+            data["normals"] = np.frombuffer(normals, dtype=np.float32).reshape(-1, 3)
+    return data
+
+# 读取 STL 文件
+def read_stl(file_path):
+    """
+    二进制 STL 以只读内存映射方式打开（峰值内存接近文件大小），只映射文件头声明的三角形，忽略末尾多余的字节；
+    ASCII STL 回退为流式解析。两种方式都读不到三角形时抛出 ValueError，不返回空网格。
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    if is_binary_stl(file_path):
+        count = _binary_facet_count(file_path)
+        if count > 0:
+            data = np.memmap(file_path, dtype=STL_RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+            return StlMesh(data, name)
+    data = _read_ascii_stl(file_path)
+    if len(data) == 0:
+        raise ValueError(f"STL 文件中没有可读取的三角形: {file_path}")
+    return StlMesh(data, name)
+
+# 批量写出二进制 STL
+def write_stl(vertices, file_path, header=b""):
+    """
+    由连续的 (N, 3, 3) 三角形数组直接构造 50 字节记录并一次性写出。
+    法向量用向量化叉积计算，退化三角形的法向量记为 0。
+    """
+    vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3, 3)
+    records = np.zeros(len(vertices), dtype=STL_RECORD_DTYPE)
+    records["vectors"] = vertices
+
+    normals = np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    records["normals"] = normals
+
+    with open(file_path, "wb") as f:
+        f.write(header[:80].ljust(80, b"\0"))
+        f.write(np.uint32(len(records)).tobytes())
+        records.tofile(f)
+
+class BackgroundStlWriter:
+    """
+    在后台线程中写出 STL，计算线程不必等待磁盘。
+    - write() 立即返回 Future，待写队列超过 max_pending 时阻塞，避免内存无限增长；
+    - 提交后的数组不应再被修改；close() / 退出 with 语句时等待全部写完，并抛出第一个写入错误。
+    """
+    def __init__(self, max_pending=4):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = []
+
+    def write(self, vertices, file_path):
+        self.slots.acquire()
+        future = self.executor.submit(write_stl, vertices, file_path)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+        return future
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
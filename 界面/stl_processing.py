@@ -1,41 +1,57 @@
 #包含加载 STL 文件和计算表面粗糙度的函数
 import numpy as np
 from scipy.spatial import KDTree
-from stl import mesh
+from mesh_geometry import split_triangles, mesh_data
+from stl_io import read_stl, write_stl
+from indexed_mesh import IndexedMesh, load_indexed_stl
 
 # 加载 STL 模型
-def load_stl(file_path):
-    """加载 STL 文件"""
-    return mesh.Mesh.from_file(file_path)
+def load_stl(file_path, weld=False):
+    """加载 STL 文件（二进制文件以内存映射方式零拷贝读取），weld=True 时焊接顶点并返回 IndexedMesh"""
+    if weld:
+        return load_indexed_stl(file_path)
+    return read_stl(file_path)
 
 # 保存 STL 模型
 def save_stl(vertices, file_path):
-    """保存 STL 文件"""
-    output_mesh = mesh.Mesh(np.zeros(vertices.shape[0], dtype=mesh.Mesh.dtype))
-    output_mesh.vectors = vertices
-    output_mesh.save(file_path)
+    """保存 STL 文件（直接由三角形数组构造二进制记录，一次写出）"""
+    write_stl(vertices, file_path)
+
+# 牙冠/牙根特征向量的字段（结构化数组，便于缓存和批量汇总）
+PART_FEATURE_DTYPE = np.dtype([
+    ("normal_roughness", np.float64),  # 相邻面（共享边）法向量夹角均值
+    ("height_variation", np.float64),  # Z 轴坐标标准差
+    ("curvature", np.float64),         # 相邻面（共享边）法向量夹角平方均值
+    ("edge_density", np.float64),      # 三角形周长均值
+])
+
+# STL 片段的三角形数组
+def _part_triangles(part):
+    """IndexedMesh 展开为 (N, 3, 3) 三角形，数组原样返回"""
+    return part.vectors if hasattr(part, "faces") else part
+
+# 相邻面片的法向量夹角
+def _normal_angles(part):
+    """
+    返回共享同一条边的全部相邻面对的法向量夹角（与文件中三角形的顺序无关），退化面片不参与计算。
+    IndexedMesh 直接使用其缓存的边-面邻接，三角形数组先焊接顶点再建立邻接。
+    """
+    mesh = part if hasattr(part, "faces") else IndexedMesh.from_triangles(part)
+    return mesh.dihedral_angles
 
 # 计算表面粗糙度（法向量角度变化）
 def compute_surface_roughness(part):
-    """计算 STL 片段的表面粗糙度（基于相邻法向量的夹角变化）"""
-    if part.shape[0] == 0:
+    """计算 STL 片段的表面粗糙度（基于共享边的相邻面法向量夹角）"""
+    if len(part) == 0:
         return 0  # 避免空输入
 
-    normals = np.cross(part[:, 1] - part[:, 0], part[:, 2] - part[:, 0])
-    normals /= np.linalg.norm(normals, axis=1, keepdims=True)  # 单位化法向量
-
-    roughness = 0
-    count = 0
-    for i in range(len(normals) - 1):
-        angle = np.arccos(np.clip(np.dot(normals[i], normals[i + 1]), -1.0, 1.0))
-        roughness += angle
-        count += 1
-
-    return roughness / count if count > 0 else 0
+    angles = _normal_angles(part)
+    return angles.mean() if len(angles) > 0 else 0
 
 # 计算 Z 轴高度变化（标准差）
 def compute_height_variation(part):
     """计算 STL 片段的 Z 轴坐标标准差（表面起伏度）"""
+    part = _part_triangles(part)
     if part.shape[0] == 0:
         return 0  # 避免空输入
 
@@ -45,35 +61,50 @@ def compute_height_variation(part):
 # 计算 STL 片段的平均曲率
 def compute_curvature(part):
     """计算 STL 片段的平均曲率（基于法向量夹角平方）"""
-    if part.shape[0] == 0:
+    if len(part) == 0:
         return 0  # 避免空输入
 
-    normals = np.cross(part[:, 1] - part[:, 0], part[:, 2] - part[:, 0])
-    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
-
-    curvature = 0
-    count = 0
-    for i in range(len(normals) - 1):
-        angle = np.arccos(np.clip(np.dot(normals[i], normals[i + 1]), -1.0, 1.0))
-        curvature += angle ** 2
-        count += 1
-
-    return curvature / count if count > 0 else 0
+    angles = _normal_angles(part)
+    return (angles ** 2).mean() if len(angles) > 0 else 0
 
 # 计算 STL 片段的边缘密度（平均三角形边长）
 def compute_edge_density(part):
     """计算 STL 片段的边缘密度（牙冠的 STL 边缘通常比牙根复杂）"""
+    part = _part_triangles(part)
     if part.shape[0] == 0:
         return 0  # 避免空输入
 
-    edges = np.linalg.norm(part[:, 1] - part[:, 0], axis=1) + \
-            np.linalg.norm(part[:, 2] - part[:, 1], axis=1) + \
-            np.linalg.norm(part[:, 0] - part[:, 2], axis=1)
-    
+    edges = np.linalg.norm(part - np.roll(part, -1, axis=1), axis=2).sum(axis=1)
     return np.mean(edges)  # 计算平均边长
 
+# 一次性提取 STL 片段的全部特征
+def extract_part_features(part):
+    """
+    法向量、边长和高度统计各只计算一次，返回 PART_FEATURE_DTYPE 结构化特征向量，
+    结果可直接缓存并传给 classify_parts。part 可以是 (N, 3, 3) 三角形或 IndexedMesh。
+    """
+    features = np.zeros((), dtype=PART_FEATURE_DTYPE)
+    if len(part) == 0:
+        return features  # 避免空输入
+
+    angles = _normal_angles(part)
+    part = _part_triangles(part)
+    if len(angles) > 0:
+        features["normal_roughness"] = angles.mean()
+        features["curvature"] = (angles ** 2).mean()
+    features["height_variation"] = np.std(part[:, :, 2])
+    features["edge_density"] = np.linalg.norm(part - np.roll(part, -1, axis=1), axis=2).sum(axis=1).mean()
+    return features
+
+# 特征加权综合评分
+def feature_score(features):
+    return (0.3 * features["normal_roughness"] +
+            0.3 * features["height_variation"] +
+            0.2 * features["curvature"] +
+            0.2 * features["edge_density"])
+
 # 通过多个几何特征判断牙冠和牙根
-def classify_parts(upper, below):
+def classify_parts(upper, below, upper_features=None, below_features=None):
     """
     结合多个特征判断牙冠和牙根：
     1. 计算法向量角度变化
@@ -81,34 +112,22 @@ def classify_parts(upper, below):
     3. 计算平均曲率
     4. 计算边缘密度
     5. 综合评分进行最终分类
+    已缓存的特征向量可通过 upper_features / below_features 传入，避免重复计算。
     """
-    roughness_upper_normal = compute_surface_roughness(upper)
-    roughness_below_normal = compute_surface_roughness(below)
-
-    roughness_upper_height = compute_height_variation(upper)
-    roughness_below_height = compute_height_variation(below)
-
-    curvature_upper = compute_curvature(upper)
-    curvature_below = compute_curvature(below)
-
-    edge_density_upper = compute_edge_density(upper)
-    edge_density_below = compute_edge_density(below)
+    if upper_features is None:
+        upper_features = extract_part_features(upper)
+    if below_features is None:
+        below_features = extract_part_features(below)
 
     # 综合计算最终粗糙度（加权计算）
-    roughness_upper = (0.3 * roughness_upper_normal + 
-                       0.3 * roughness_upper_height + 
-                       0.2 * curvature_upper + 
-                       0.2 * edge_density_upper)
-    
-    roughness_below = (0.3 * roughness_below_normal + 
-                       0.3 * roughness_below_height + 
-                       0.2 * curvature_below + 
-                       0.2 * edge_density_below)
+    roughness_upper = feature_score(upper_features)
+    roughness_below = feature_score(below_features)
 
     # 打印分类信息
     print("=== 牙冠与牙根分类信息 ===")
-    print(f"🔹 upper 法向量粗糙度: {roughness_upper_normal:.5f}, 高度变化: {roughness_upper_height:.5f}, 曲率: {curvature_upper:.5f}, 边缘密度: {edge_density_upper:.5f}, 综合: {roughness_upper:.5f}")
-    print(f"🔹 below 法向量粗糙度: {roughness_below_normal:.5f}, 高度变化: {roughness_below_height:.5f}, 曲率: {curvature_below:.5f}, 边缘密度: {edge_density_below:.5f}, 综合: {roughness_below:.5f}")
+    for label, features, score in (("upper", upper_features, roughness_upper), ("below", below_features, roughness_below)):
+        print(f"🔹 {label} 法向量粗糙度: {features['normal_roughness']:.5f}, 高度变化: {features['height_variation']:.5f}, "
+              f"曲率: {features['curvature']:.5f}, 边缘密度: {features['edge_density']:.5f}, 综合: {score:.5f}")
 
     # 设定阈值，防止小范围误差导致分类错误
     THRESHOLD = 0.02  
@@ -121,31 +140,14 @@ def classify_parts(upper, below):
         return below, upper  # 交换，使牙冠始终是 upper，牙根是 below
 
 # 分割模型
-def split_model(model, plane_point, plane_normal):
+def split_model(model, plane_point, plane_normal, clip=False):
     """
     按照最大横向截面分割 STL 模型。
     - 计算模型与平面的交点，将其分为上下两部分。
     - 调用 `classify_parts()` 使得返回的 upper 始终是牙冠，below 始终是牙根。
     """
-    above_vertices = []
-    below_vertices = []
-
-    for triangle in model.vectors:
-        above = []
-        below = []
-
-        for vertex in triangle:
-            if np.dot(vertex - plane_point, plane_normal) > 0:
-                above.append(vertex)
-            else:
-                below.append(vertex)
-
-        if len(above) == 3:
-            above_vertices.append(triangle)
-        elif len(below) == 3:
-            below_vertices.append(triangle)
-
-    upper, below = np.array(above_vertices), np.array(below_vertices)
+    # 向量化分类，clip=True 时沿平面切开跨越的三角形
+    upper, below = split_triangles(mesh_data(model), plane_point, plane_normal, clip)
     upper, below = classify_parts(upper, below)  # 重新分类
 
     return upper, below
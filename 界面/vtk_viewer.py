@@ -2,21 +2,150 @@
 # 读取 STL 文件
 # 创建 3D 物体、渲染器和交互窗口
 # 启动 PyQt VTK 交互窗口
+# 查看器运行在常驻子进程中，Qt/VTK 只初始化一次，主程序通过管道发送“加载模型”等命令
+# 旋转时自动切换到二次误差抽稀的低精度层级，静止后恢复全分辨率，抽稀结果缓存在磁盘上
 import vtkmodules.all as vtk
-import tkinter as tk
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QMainWindow, QApplication, QVBoxLayout, QWidget
+import os
 import sys
+from result_cache import file_digest
+
+# 各 LOD 层级的抽稀比例（去掉的三角形比例）
+LOD_REDUCTIONS = (0.5, 0.8, 0.95)
+
+# 抽稀结果的磁盘缓存目录
+LOD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stl_viewer_lod")
+
+# 抽稀缓存的容量上限（字节），超出后按修改时间淘汰最久未使用的 .vtp
+LOD_CACHE_MAX_BYTES = 1 << 30
+
+# 查看器进程检查管道命令的间隔（毫秒）
+COMMAND_POLL_MS = 50
+
+# 预读结果最多保留的文件数
+PREFETCH_LIMIT = 2
+
+# 读取 STL 为 vtkPolyData
+def read_stl_polydata(stl_file):
+    reader = vtk.vtkSTLReader()
+    reader.SetFileName(stl_file)
+    reader.Update()
+    return reader.GetOutput()
+
+# 按容量淘汰抽稀缓存
+def evict_lod_cache(cache_dir=LOD_CACHE_DIR, max_bytes=LOD_CACHE_MAX_BYTES):
+    """.vtp 总大小超过 max_bytes 时按修改时间从旧到新删除（LRU，命中时会刷新修改时间）"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".vtp"):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+# 构建 LOD 层级
+def build_lod_levels(stl_file, polydata=None, reductions=LOD_REDUCTIONS, cache_dir=LOD_CACHE_DIR,
+                     max_bytes=LOD_CACHE_MAX_BYTES):
+    """
+    返回与 reductions 顺序一致的 [(抽稀比例, vtkPolyData)]，也可用于生成预览。
+    - 用 vtkQuadricDecimation 按比例抽稀，结果以 .vtp 保存，键为 STL 内容哈希 + 抽稀比例；
+    - 再次打开同一文件时直接读取缓存，不重复抽稀；cache_dir 为 None 时不使用缓存；
+    - 缓存总大小超过 max_bytes 时按最近使用时间淘汰旧文件。
+    """
+    if polydata is None:
+        polydata = read_stl_polydata(stl_file)
+    digest = file_digest(stl_file) if cache_dir else None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    levels = []
+    written = False
+    for reduction in reductions:
+        path = os.path.join(cache_dir, f"{digest}_{round(reduction * 1000)}.vtp") if cache_dir else None
+        if path and os.path.exists(path):
+            reader = vtk.vtkXMLPolyDataReader()
+            reader.SetFileName(path)
+            reader.Update()
+            levels.append((reduction, reader.GetOutput()))
+            try:
+                os.utime(path)  # 记录最近一次使用，供 LRU 淘汰
+            except FileNotFoundError:
+                pass
+            continue
+
+        decimate = vtk.vtkQuadricDecimation()
+        decimate.SetInputData(polydata)
+        decimate.SetTargetReduction(reduction)
+        decimate.Update()
+        level = decimate.GetOutput()
+        if path:
+            # 先写临时文件再原子替换，避免并发打开时读到半个文件
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            writer = vtk.vtkXMLPolyDataWriter()
+            writer.SetFileName(tmp_path)
+            writer.SetInputData(level)
+            writer.SetDataModeToBinary()
+            writer.Write()
+            os.replace(tmp_path, path)
+            written = True
+        levels.append((reduction, level))
+    if written:
+        evict_lod_cache(cache_dir, max_bytes)
+    return levels
+
+# 同一目录中按文件名排序的下一个 STL，作为预读对象
+def next_stl_file(stl_file):
+    folder = os.path.dirname(os.path.abspath(stl_file))
+    try:
+        names = sorted(f for f in os.listdir(folder) if f.lower().endswith(".stl"))
+    except OSError:
+        return None
+    name = os.path.basename(stl_file)
+    if name not in names:
+        return None
+    index = names.index(name) + 1
+    return os.path.join(folder, names[index]) if index < len(names) else None
 
 class VTKViewer(QMainWindow):
     """
-    3D VTK 交互式查看器，嵌入 Tkinter 的 Toplevel 窗口
+    3D VTK 交互式查看器
+    模型以 vtkLODProp3D 显示：交互时按期望帧率自动选用抽稀层级，静止时渲染全分辨率模型
+    - load() 只替换各层级 mapper 的输入数据，窗口、渲染器和相机保持不变；
+    - 每次加载后在后台线程预读同一目录中的下一个 STL（含 LOD 层级），再打开它时无需等待；
+    - persistent=True 时关闭窗口只是隐藏，供常驻进程下次加载时复用。
     """
-    def __init__(self, stl_file):
+    def __init__(self, stl_file=None, reductions=LOD_REDUCTIONS, cache_dir=LOD_CACHE_DIR, persistent=False,
+                 cache_max_bytes=LOD_CACHE_MAX_BYTES):
         super().__init__()
 
         self.setWindowTitle("STL 三维展示")
         self.setGeometry(100, 100, 800, 800)
+        self.reductions = reductions
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.persistent = persistent
+
+        # 预读：文件路径 -> Future[(polydata, levels)]，单线程执行，按插入顺序淘汰
+        self.prefetcher = ThreadPoolExecutor(max_workers=1)
+        self.prefetched = {}
+        self.prefetch_lock = threading.Lock()
 
         # 1️ **创建 VTK 窗口**
         self.frame = QWidget()
@@ -24,41 +153,191 @@ class VTKViewer(QMainWindow):
         self.frame.setLayout(self.layout)
         self.setCentralWidget(self.frame)
 
-        # 2️ **读取 STL 文件**
-        reader = vtk.vtkSTLReader()
-        reader.SetFileName(stl_file)
-        reader.Update()
+        # 2️ **创建 3D 物体（全分辨率 + 各抽稀层级的 mapper 在第一次加载时创建）**
+        self.prop = vtk.vtkProperty()
+        self.prop.SetColor(0.8, 0.8, 0.8)
 
-        # 3️ **创建 3D 物体**
-        mapper = vtk.vtkPolyDataMapper()
-        mapper.SetInputConnection(reader.GetOutputPort())
+        self.actor = vtk.vtkLODProp3D()
+        self.actor.AutomaticLODSelectionOn()
+        self.mappers = []
 
-        actor = vtk.vtkActor()
-        actor.SetMapper(mapper)
-        actor.GetProperty().SetColor(0.8, 0.8, 0.8)
+        # 3️ **创建渲染器**
+        self.renderer = vtk.vtkRenderer()
+        self.renderer.AddViewProp(self.actor)
+        self.renderer.SetBackground(0.1, 0.1, 0.1)
 
-        # 4️ **创建渲染器**
-        renderer = vtk.vtkRenderer()
-        renderer.AddActor(actor)
-        renderer.SetBackground(0.1, 0.1, 0.1)
-
-        # 5️ **创建 VTK 交互窗口**
+        # 4️ **创建 VTK 交互窗口**
         self.vtk_widget = QVTKRenderWindowInteractor(self.frame)
         self.layout.addWidget(self.vtk_widget)
-        self.vtk_widget.GetRenderWindow().AddRenderer(renderer)
+        self.vtk_widget.GetRenderWindow().AddRenderer(self.renderer)
 
-        # 6️ **交互控制**
+        # 5️ **交互控制**
         self.iren = self.vtk_widget.GetRenderWindow().GetInteractor()
         style = vtk.vtkInteractorStyleTrackballCamera()
         self.iren.SetInteractorStyle(style)
+        self.iren.SetDesiredUpdateRate(15.0)  # 旋转时的目标帧率，超出预算时切换到低精度层级
+        self.iren.SetStillUpdateRate(0.001)   # 静止时不限时，渲染全分辨率
         self.iren.Initialize()
+
+        # 6️ **读取 STL 文件并显示**
+        if stl_file:
+            self.load(stl_file)
         self.iren.Start()
 
-def open_vtk_viewer(stl_file):
+    def _read(self, stl_file):
+        """读取 STL 并构建 LOD 层级（命中磁盘缓存时不重新抽稀）"""
+        polydata = read_stl_polydata(stl_file)
+        return polydata, build_lod_levels(stl_file, polydata, self.reductions, self.cache_dir, self.cache_max_bytes)
+
+    def prefetch(self, stl_file):
+        """在后台线程读取 stl_file，已在预读中或已读完时不重复提交"""
+        if not stl_file:
+            return
+        stl_file = os.path.abspath(stl_file)
+        with self.prefetch_lock:
+            if stl_file in self.prefetched:
+                return
+            self.prefetched[stl_file] = self.prefetcher.submit(self._read, stl_file)
+            while len(self.prefetched) > PREFETCH_LIMIT:
+                self.prefetched.pop(next(iter(self.prefetched)))
+
+    def load(self, stl_file):
+        """显示 stl_file：替换各层级的输入数据，第一次加载时重置相机，之后保持当前视角"""
+        stl_file = os.path.abspath(stl_file)
+        with self.prefetch_lock:
+            future = self.prefetched.pop(stl_file, None)
+        # 正在预读时等待其完成，预读失败则在当前线程重新读取以得到原始异常
+        try:
+            polydata, levels = future.result() if future is not None else self._read(stl_file)
+        except Exception:
+            if future is None:
+                raise
+            polydata, levels = self._read(stl_file)
+
+        data = [polydata] + [level for _, level in levels]
+        first_load = not self.mappers
+        if first_load:
+            for level in data:
+                mapper = vtk.vtkPolyDataMapper()
+                mapper.SetInputData(level)
+                self.actor.AddLOD(mapper, self.prop, 0.0)  # 渲染耗时由 VTK 实测估计
+                self.mappers.append(mapper)
+            self.renderer.ResetCamera()
+        else:
+            for mapper, level in zip(self.mappers, data):
+                mapper.SetInputData(level)
+            self.renderer.ResetCameraClippingRange()
+
+        self.setWindowTitle(f"STL 三维展示 - {os.path.basename(stl_file)}")
+        self.vtk_widget.GetRenderWindow().Render()
+        self.prefetch(next_stl_file(stl_file))
+
+    def closeEvent(self, event):
+        if self.persistent:
+            # 常驻模式下只隐藏窗口，下次加载时复用
+            event.ignore()
+            self.hide()
+        else:
+            self.prefetcher.shutdown(wait=False)
+            super().closeEvent(event)
+
+# 常驻查看器进程的入口
+def _viewer_main(conn, reductions=LOD_REDUCTIONS, cache_dir=LOD_CACHE_DIR, cache_max_bytes=LOD_CACHE_MAX_BYTES):
     """
-    启动 PyQt VTK 交互窗口
+    创建唯一的 QApplication 和 VTKViewer，用 QTimer 轮询管道中的命令：
+    ("load", 路径) 显示模型并把窗口提到前台，("prefetch", 路径) 后台预读，("quit",) 退出。
+    主程序退出（管道关闭）时查看器进程随之退出。
     """
     app = QApplication(sys.argv)
-    viewer = VTKViewer(stl_file)
-    viewer.show()
+    viewer = VTKViewer(reductions=reductions, cache_dir=cache_dir, persistent=True, cache_max_bytes=cache_max_bytes)
+
+    def poll_commands():
+        try:
+            while conn.poll():
+                command, *args = conn.recv()
+                if command == "load":
+                    try:
+                        viewer.load(args[0])
+                    except Exception as e:
+                        print(f"无法打开 {args[0]}: {e}")
+                        continue
+                    viewer.show()
+                    viewer.raise_()
+                    viewer.activateWindow()
+                elif command == "prefetch":
+                    viewer.prefetch(args[0])
+                elif command == "quit":
+                    app.quit()
+                    return
+        except (EOFError, OSError):
+            app.quit()
+
+    timer = QTimer()
+    timer.timeout.connect(poll_commands)
+    timer.start(COMMAND_POLL_MS)
     app.exec_()
+    viewer.prefetcher.shutdown(wait=False)
+
+class ViewerClient:
+    """
+    主程序一侧的查看器句柄：第一次使用时以 spawn 方式启动常驻查看器进程，之后只通过管道发送命令，立即返回。
+    查看器进程意外退出时，下一条命令会重新启动它。
+    """
+    def __init__(self, reductions=LOD_REDUCTIONS, cache_dir=LOD_CACHE_DIR, cache_max_bytes=LOD_CACHE_MAX_BYTES):
+        self.reductions = reductions
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.process = None
+        self.conn = None
+
+    def _ensure_started(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        context = multiprocessing.get_context("spawn")  # 不继承主程序的 Tk / 线程状态
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_viewer_main, args=(child_conn, self.reductions, self.cache_dir, self.cache_max_bytes),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def _send(self, *command):
+        self._ensure_started()
+        try:
+            self.conn.send(command)
+        except (EOFError, OSError):
+            # 查看器进程刚刚退出，重启后重发一次
+            self.process = None
+            self._ensure_started()
+            self.conn.send(command)
+
+    def load(self, stl_file):
+        self._send("load", os.path.abspath(stl_file))
+
+    def prefetch(self, stl_file):
+        self._send("prefetch", os.path.abspath(stl_file))
+
+    def close(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(("quit",))
+            except (EOFError, OSError):
+                pass
+            self.process.join(timeout=5)
+        self.process = None
+
+_viewer_client = None
+
+def get_viewer_client():
+    """返回全局共享的 ViewerClient"""
+    global _viewer_client
+    if _viewer_client is None:
+        _viewer_client = ViewerClient()
+    return _viewer_client
+
+def open_vtk_viewer(stl_file):
+    """
+    在常驻查看器进程中打开 STL：第一次调用时启动进程，之后复用同一窗口并保持当前视角，调用立即返回
+    """
+    if not os.path.exists(stl_file):
+        raise FileNotFoundError(stl_file)
+    get_viewer_client().load(stl_file)